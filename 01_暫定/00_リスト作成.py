@@ -6,12 +6,15 @@ from __future__ import annotations
 import re
 import time
 from dataclasses import dataclass
+from functools import lru_cache
+from html.parser import HTMLParser
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 import sqlite3
 from zoneinfo import ZoneInfo
 
+import requests
 from tqdm import tqdm
 from dateutil import parser as dtparser
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
@@ -41,6 +44,14 @@ SLEEP_SEC = 0.6                  # 一覧ページ間隔
 REQUEST_BLOCK = True             # 画像/CSS/フォント等をブロックして高速化
 DETAIL_SLEEP_SEC = 0.05          # first_post 取得間隔（短め）
 
+# first_post（HTTP直取得）
+FIRST_POST_VIA_HTTP = True       # comment/1 はブラウザを通さず requests で取得（失敗時のみ Playwright）
+TIMEOUT_SEC_FIRSTPOST_HTTP = 10.0
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
 # ログ/早期終了
 ECHO_EACH_SAVE = True
 EARLY_STOP_PAGES = 2             # “保存0件ページ” が連続したらカテゴリを打ち切り（0で無効）
@@ -69,6 +80,7 @@ ENABLED_CATEGORY_INDEXES: List[int] = [0, 1]
 # 正規表現
 # =========================================================
 RE_TOPIC_HREF = re.compile(r"/topics/(\d+)/")
+RE_NON_DIGIT = re.compile(r"\D")
 
 # commentページの本文から、最初に見つかった日時っぽい文字列を拾う（例: 2026/01/03(土) 09:26:43）
 RE_FIRSTPOST_ANY = re.compile(
@@ -138,6 +150,43 @@ CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_sort_cc_desc_lp_asc
   ON {TABLE_NAME}(comments_count DESC, last_post ASC);
 """
 
+# =========================================================
+# SQL（毎回組み立てず、モジュール定数を使い回す）
+# =========================================================
+_SQL_INSERT_HEAD = f"""
+INSERT INTO {TABLE_NAME} (
+    id, check_date, first_seen_at, first_post, last_post,
+    comments_count, category, title, out_auto
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_UPSERT = _SQL_INSERT_HEAD + f"""
+ON CONFLICT(id) DO UPDATE SET
+  check_date=excluded.check_date,
+  first_seen_at=COALESCE({TABLE_NAME}.first_seen_at, excluded.first_seen_at),
+  first_post=COALESCE({TABLE_NAME}.first_post, excluded.first_post),
+  last_post=excluded.last_post,
+  comments_count=excluded.comments_count,
+  category=excluded.category,
+  title=excluded.title,
+  out_auto=excluded.out_auto
+RETURNING first_seen_at
+"""
+
+SQL_INSERT_IF_ABSENT = _SQL_INSERT_HEAD + """
+ON CONFLICT(id) DO NOTHING
+RETURNING first_seen_at
+"""
+
+SQL_GET_EXCLUDED = f"SELECT excluded FROM {TABLE_NAME} WHERE id=? LIMIT 1"
+
+SQL_SET_FIRST_POST = f"""
+UPDATE {TABLE_NAME}
+   SET first_post = COALESCE(first_post, ?)
+ WHERE id=?
+"""
+
 # =========================================================
 # DBユーティリティ
 # =========================================================
@@ -246,50 +295,43 @@ def ensure_schema(con: sqlite3.Connection) -> None:
     )
     con.commit()
 
-def exists_id(con: sqlite3.Connection, tid: str) -> bool:
-    return con.execute(f"SELECT 1 FROM {TABLE_NAME} WHERE id=? LIMIT 1", (tid,)).fetchone() is not None
+def close_db(con: sqlite3.Connection) -> None:
+    """
+    終了時に統計更新と WAL の切り詰めを行ってから閉じる（次回起動を軽くする）
+    """
+    try:
+        con.commit()
+        con.execute("PRAGMA optimize;")
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    except sqlite3.Error as e:
+        print(f"[WARN] checkpoint on close failed: {e}")
+    finally:
+        con.close()
 
 def get_excluded(con: sqlite3.Connection, tid: str) -> int:
-    row = con.execute(f"SELECT excluded FROM {TABLE_NAME} WHERE id=? LIMIT 1", (tid,)).fetchone()
+    row = con.execute(SQL_GET_EXCLUDED, (tid,)).fetchone()
     if not row:
         return 0
     return int(row[0] or 0)
 
 def set_first_post(con: sqlite3.Connection, tid: str, first_post: str) -> None:
-    con.execute(
-        f"""
-        UPDATE {TABLE_NAME}
-           SET first_post = COALESCE(first_post, ?)
-         WHERE id=?;
-        """,
-        (first_post, tid),
-    )
+    con.execute(SQL_SET_FIRST_POST, (first_post, tid))
 
-def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
+def upsert(con: sqlite3.Connection, row: Dict[str, Any], update_existing: bool = True) -> bool | None:
     """
     - first_seen_at は初回INSERTで入れる / 以後保持（NULLのときだけ埋める）
     - first_post も同様に “NULLのときだけ埋める”（後段で入れる）
     - last_post は毎回更新
     - out_manual は手動なのでUPSERT更新で触らない（=消さない）
     - excluded はトリガーで out_auto/out_manual から自動同期
+
+    戻り値（RETURNING で判定するので事前の存在確認SELECTは不要）:
+    - True  : 新規INSERT
+    - False : 既存を更新
+    - None  : update_existing=False で既存だったため何もしていない
     """
-    sql = f"""
-    INSERT INTO {TABLE_NAME} (
-        id, check_date, first_seen_at, first_post, last_post,
-        comments_count, category, title, out_auto
-    )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(id) DO UPDATE SET
-      check_date=excluded.check_date,
-      first_seen_at=COALESCE({TABLE_NAME}.first_seen_at, excluded.first_seen_at),
-      first_post=COALESCE({TABLE_NAME}.first_post, excluded.first_post),
-      last_post=excluded.last_post,
-      comments_count=excluded.comments_count,
-      category=excluded.category,
-      title=excluded.title,
-      out_auto=excluded.out_auto
-    """
-    con.execute(sql, (
+    sql = SQL_UPSERT if update_existing else SQL_INSERT_IF_ABSENT
+    got = con.execute(sql, (
         row["id"],
         row["check_date"],
         row["first_seen_at"],
@@ -299,14 +341,17 @@ def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
         row["category"],
         row["title"],
         int(row["out_auto"]),
-    ))
+    )).fetchone()
+    if got is None:
+        return None
+    # 既存行は first_seen_at を保持するので、今回の値のままなら新規
+    return got[0] == row["first_seen_at"]
 
 # =========================================================
 # 変換/判定
 # =========================================================
 def digits_only_int(s: str) -> int:
-    nums = re.findall(r"\d+", (s or "").replace(",", ""))
-    return int("".join(nums)) if nums else 0
+    return int(RE_NON_DIGIT.sub("", s or "") or "0")
 
 def normalize_list_datetime(raw: str) -> str:
     """
@@ -332,6 +377,57 @@ def parse_first_post_from_text(body_text: str) -> str | None:
     y, mo, d, hh, mm, ss = m.groups()
     return f"{y}-{mo}-{d} {hh}:{mm}:{ss}"
 
+# body.inner_text() 相当のテキストにするときの扱い
+#  - 中身を捨てる要素（script 等）/ 前後で改行する要素（それ以外のインライン要素は改行しない）
+_HTML_SKIP_TAGS = frozenset({"head", "script", "style", "noscript", "template", "svg"})
+_HTML_BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+})
+
+_RE_HTML_WS = re.compile(r"\s+")
+
+class _BodyTextParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in _HTML_SKIP_TAGS:
+            self._skip += 1
+        elif tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        if tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag) -> None:
+        if tag in _HTML_SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data) -> None:
+        if not self._skip:
+            self.parts.append(_RE_HTML_WS.sub(" ", data))
+
+def html_to_text(html: str) -> str:
+    """
+    HTML からタグ・属性・script/style を除いた表示テキストを作る（body.inner_text() の近似）
+    - 行内の空白は詰め、ブロック要素の境目だけ改行にする
+    """
+    parser = _BodyTextParser()
+    try:
+        parser.feed(html or "")
+        parser.close()
+    except Exception:
+        pass
+    return "".join(parser.parts)
+
+@lru_cache(maxsize=4096)
 def should_out_auto(title: str) -> int:
     t = (title or "")
     if "PART" in t.upper():
@@ -384,6 +480,84 @@ def fetch_first_post_via_comment1(detail_page, thread_id: str) -> str | None:
 
     return parse_first_post_from_text(body_txt)
 
+def new_http_session() -> requests.Session:
+    """
+    comment/1 直取得用のセッション（コネクションを使い回す）
+    """
+    sess = requests.Session()
+    sess.headers.update({
+        "User-Agent": HTTP_USER_AGENT,
+        "Accept-Language": "ja-JP,ja;q=0.9",
+        "Connection": "keep-alive",
+    })
+    # 接続先は girlschannel.net だけなので 1ホスト分のプールを実行中ずっと使い回す
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=8)
+    sess.mount("https://", adapter)
+    return sess
+
+def sync_cookies_to_session(context, sess: requests.Session) -> None:
+    """
+    一覧取得でブラウザ側が受け取った Cookie を HTTP セッションへ引き継ぐ
+    """
+    try:
+        cookies = context.cookies("https://girlschannel.net")
+    except Exception:
+        return
+    for c in cookies:
+        sess.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
+
+def fetch_first_post_via_http(sess: requests.Session, thread_id: str) -> str | None:
+    """
+    comment/{id}/1 の HTML を直接取得して日時を拾う（DOM構築・JS実行なし）
+    """
+    url = f"https://girlschannel.net/comment/{thread_id}/1/"
+    try:
+        resp = sess.get(url, timeout=TIMEOUT_SEC_FIRSTPOST_HTTP)
+    except requests.RequestException:
+        return None
+    if resp.status_code >= 400:
+        return None
+
+    # body.inner_text() 相当にするため、タグ/属性/script を落としたテキストから拾う
+    html = resp.text
+    return parse_first_post_from_text(html_to_text(html))
+
+# =========================================================
+# 一覧ページの抽出（page.evaluate 1回で全 li を取る）
+#  - XPath は従来の locator と同じもの
+#  - 戻り値は li ごとに [href, comments, last, title] を並べた平坦な配列
+#    （dict の配列より CDP 越しのシリアライズが軽い）
+# =========================================================
+LIST_ROW_WIDTH = 4
+
+JS_LIST_ROWS_FLAT = """
+() => {
+  const first = (xp, ctx) => document.evaluate(
+    xp, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+  ).singleNodeValue;
+  const text = (xp, ctx) => {
+    const n = first(xp, ctx);
+    return n ? n.innerText : null;
+  };
+  const snap = document.evaluate(
+    "/html/body/div[1]/div[1]/div[1]/ul[2]/li", document, null,
+    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+  );
+  const out = [];
+  for (let i = 0; i < snap.snapshotLength; i++) {
+    const li = snap.snapshotItem(i);
+    const a = first("./a", li);
+    out.push(
+      a ? (a.getAttribute("href") || "") : "",
+      text("./a/div/p/span[2]", li),
+      text("./a/div/p/span[3]", li),
+      text("./a/p", li),
+    );
+  }
+  return out;
+}
+"""
+
 # =========================================================
 # Playwright高速化：リクエストブロック
 # =========================================================
@@ -441,6 +615,7 @@ def main() -> int:
 
     # ★新規に入った thread_id のリスト（first_post取得候補）
     newly_inserted_ids: List[str] = []
+    newly_inserted_set: set[str] = set()
 
     # ★first_post 統計
     first_post_filled = 0
@@ -457,6 +632,9 @@ def main() -> int:
     print(f"[INFO] enabled_categories: {', '.join([c.name for c in enabled_categories])}")
     print(f"[INFO] first_post: comment/1 から取得（excluded=1はスキップ）")
     print(f"[INFO] request_block: {REQUEST_BLOCK}")
+    print(f"[INFO] first_post_via_http: {FIRST_POST_VIA_HTTP}")
+
+    http = new_http_session() if FIRST_POST_VIA_HTTP else None
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=HEADLESS)
@@ -501,51 +679,45 @@ def main() -> int:
                         time.sleep(SLEEP_SEC)
                         continue
 
-                    li_locator = page.locator("xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li")
-                    li_count = li_locator.count()
+                    # li ごとに [href, comments, last, title] を平坦に詰めた配列を1回で受け取る
+                    try:
+                        flat = page.evaluate(JS_LIST_ROWS_FLAT)
+                    except Exception as e:
+                        failed_page += 1
+                        print(f"[PAGE_EVAL_FAIL] cat={cfg.name} page={page_no} url={url} err={e}")
+                        time.sleep(SLEEP_SEC)
+                        continue
+                    li_count = len(flat) // LIST_ROW_WIDTH
                     if li_count == 0:
                         print(f"[NO_ITEMS] cat={cfg.name} page={page_no} url={url}")
                         break
 
-                    # (orig_idx, row, already)
-                    page_rows: List[Tuple[int, Dict[str, Any], bool]] = []
+                    # (orig_idx, row)
+                    page_rows: List[Tuple[int, Dict[str, Any]]] = []
 
-                    for idx in range(1, li_count + 1):
+                    for base in range(0, li_count * LIST_ROW_WIDTH, LIST_ROW_WIDTH):
+                        idx = base // LIST_ROW_WIDTH + 1
                         seen += 1
 
-                        a = page.locator(
-                            f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a"
-                        ).first
-                        href = a.get_attribute("href") or ""
-                        m = RE_TOPIC_HREF.search(href)
+                        href, comments_raw, last_raw, title = flat[base:base + LIST_ROW_WIDTH]
+                        m = RE_TOPIC_HREF.search(href or "")
                         if not m:
                             failed_item += 1
                             continue
                         tid = m.group(1)
 
-                        try:
-                            comments_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[2]"
-                            ).first.inner_text(timeout=5000).strip()
-                            last_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[3]"
-                            ).first.inner_text(timeout=5000).strip()
-                            title = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/p"
-                            ).first.inner_text(timeout=5000).strip()
-                        except PWTimeoutError:
+                        if comments_raw is None or last_raw is None or title is None:
                             failed_item += 1
                             continue
+                        comments_raw = comments_raw.strip()
+                        last_raw = last_raw.strip()
+                        title = title.strip()
 
                         comments_count = digits_only_int(comments_raw)
                         if comments_count < MIN_COMMENTS:
                             skipped_under_min += 1
                             continue
 
-                        already = exists_id(con, tid)
-                        if (not UPDATE_EXISTING) and already:
-                            continue
-
                         last_post = normalize_list_datetime(last_raw)
                         out_auto = should_out_auto(title)
 
@@ -560,18 +732,22 @@ def main() -> int:
                             "title": title,
                             "out_auto": out_auto,
                         }
-                        page_rows.append((idx, row, already))
+                        page_rows.append((idx, row))
 
                     # ページ内をコメント多い順→last_post古い順に整列
                     page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["last_post"])))
 
                     page_saved = 0
-                    for orig_idx, row, already in page_rows:
+                    for orig_idx, row in page_rows:
                         if saved >= TARGET_NEW_COUNT:
                             break
 
-                        upsert(con, row)
+                        is_new = upsert(con, row, update_existing=UPDATE_EXISTING)
                         con.commit()
+                        if is_new is None:
+                            continue
+                        # 同一実行内で2回目に出てきた id は first_seen_at が一致しても更新扱い
+                        already = (not is_new) or (row["id"] in newly_inserted_set)
 
                         saved += 1
                         page_saved += 1
@@ -585,6 +761,7 @@ def main() -> int:
                         else:
                             new_inserts += 1
                             newly_inserted_ids.append(row["id"])
+                            newly_inserted_set.add(row["id"])
 
                         if ECHO_EACH_SAVE:
                             print(
@@ -619,13 +796,18 @@ def main() -> int:
             else:
                 print("\n[STEP2] no newly inserted ids -> skip first_post fetching")
 
+            if http and newly_inserted_ids:
+                sync_cookies_to_session(context, http)
+
             for i, tid in enumerate(newly_inserted_ids, start=1):
                 # excluded=1は取得しない（要件）
                 if get_excluded(con, tid) == 1:
                     first_post_skipped_excluded += 1
                     continue
 
-                fp = fetch_first_post_via_comment1(detail_page, tid)
+                fp = fetch_first_post_via_http(http, tid) if http else None
+                if not fp:
+                    fp = fetch_first_post_via_comment1(detail_page, tid)
                 if fp:
                     set_first_post(con, tid, fp)
                     con.commit()
@@ -640,7 +822,9 @@ def main() -> int:
                     time.sleep(DETAIL_SLEEP_SEC)
 
         finally:
-            con.close()
+            if http:
+                http.close()
+            close_db(con)
             context.close()
             browser.close()
 
@@ -19,18 +19,22 @@
 
 from __future__ import annotations
 
+import asyncio
+import operator
 import re
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Set, Tuple
 import sqlite3
 from zoneinfo import ZoneInfo
 
 from tqdm import tqdm
 from dateutil import parser as dtparser
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
+from playwright.async_api import async_playwright
 
 
 # =========================================================
@@ -57,9 +61,11 @@ TIMEOUT_MS_FIRSTPOST_TEXT = 3000
 SLEEP_SEC = 0.6
 REQUEST_BLOCK = True
 DETAIL_SLEEP_SEC = 0.05
+DETAIL_CONCURRENCY = 4   # STEP2 で同時に開く詳細ページ数
 
 ECHO_EACH_SAVE = True
 EARLY_STOP_PAGES = 2
+CHECKPOINT_EVERY_PAGES = 10   # STEP1 はこのページ数ごとに WAL checkpoint（commit はページごと）
 
 OUT_AUTO_WORDS = [
     "Part", "PART",
@@ -80,8 +86,23 @@ ENABLED_CATEGORY_INDEXES: List[int] = [0, 1]
 # =========================================================
 # 正規表現
 # =========================================================
-RE_TOPIC_HREF = re.compile(r"/topics/(\d+)/")
 RE_FIRSTPOST_ANY = re.compile(r"(\d{4})/(\d{2})/(\d{2}).*?(\d{2}):(\d{2}):(\d{2})")
+RE_DIGITS = re.compile(r"\d+")
+# 一覧の日時（例: 2024/01/07 19:20 / 01/07 19:20 / 2024/01/07(日) 19:20:05）。外れたら dateutil に回す
+RE_LIST_DT = re.compile(
+    r"^\s*(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})(?:\s*\([^)]*\))?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$"
+)
+# リクエストブロック対象（画像/フォント/CSS/メディア）
+RE_BLOCK_URL = re.compile(r"\.(?:png|jpe?g|gif|webp|svg|ico|woff2?|ttf|otf|css|mp4|mp3)(?:\?|$)", re.I)
+
+
+# out_auto 判定：OUT_AUTO_WORDS を1本の正規表現にまとめる（PART だけ大文字小文字を無視）
+RE_OUT_AUTO = re.compile(
+    "|".join(
+        ["(?i:PART)"]
+        + [re.escape(w) for w in OUT_AUTO_WORDS if w and w not in ("Part", "PART")]
+    )
+)
 
 
 # =========================================================
@@ -104,7 +125,8 @@ CATEGORIES: List[CategoryConfig] = [
 # =========================================================
 # DDL
 # =========================================================
-DDL_ITEMS_ALL = f"""
+# excluded は out_auto/out_manual からの生成列（トリガー同期をやめて書き込みを1回にする）
+DDL_ITEMS_ALL_TABLE = f"""
 CREATE TABLE IF NOT EXISTS {TABLE_ALL} (
   id INTEGER PRIMARY KEY,
   code TEXT NOT NULL UNIQUE,
@@ -117,12 +139,15 @@ CREATE TABLE IF NOT EXISTS {TABLE_ALL} (
   title TEXT NOT NULL,
   out_auto INTEGER NOT NULL DEFAULT 0,
   out_manual INTEGER NOT NULL DEFAULT 0,
-  excluded INTEGER NOT NULL DEFAULT 0,
+  excluded INTEGER GENERATED ALWAYS AS (
+    CASE WHEN COALESCE(out_auto,0)=1 OR COALESCE(out_manual,0)=1 THEN 1 ELSE 0 END
+  ) VIRTUAL,
   comment_average REAL,
   comment_average2 REAL
 );
+"""
 
-
+DDL_ITEMS_ALL_INDEX = f"""
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_code ON {TABLE_ALL}(code);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_check_date ON {TABLE_ALL}(check_date);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_first_seen_at ON {TABLE_ALL}(first_seen_at);
@@ -132,10 +157,11 @@ CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_comments ON {TABLE_ALL}(comments_coun
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_category ON {TABLE_ALL}(category);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_out_auto ON {TABLE_ALL}(out_auto);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_out_manual ON {TABLE_ALL}(out_manual);
-CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_excluded ON {TABLE_ALL}(excluded);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_comment_average ON {TABLE_ALL}(comment_average);
 """
 
+DDL_ITEMS_ALL = DDL_ITEMS_ALL_TABLE + DDL_ITEMS_ALL_INDEX
+
 DDL_DO_DONE = f"""
 CREATE TABLE IF NOT EXISTS {TABLE_DO} (
   id INTEGER PRIMARY KEY,
@@ -173,9 +199,13 @@ CREATE INDEX IF NOT EXISTS idx_{TABLE_DONE}_updated_at ON {TABLE_DONE}(updated_a
 # =========================================================
 def connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(str(db_path), timeout=30)
+    con = sqlite3.connect(str(db_path))
     con.execute("PRAGMA journal_mode=WAL;")
     con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA temp_store=MEMORY;")       # window関数のソート等の一時B-treeをRAMに
+    con.execute("PRAGMA cache_size=-65536;")       # 64 MiB
+    con.execute("PRAGMA mmap_size=268435456;")     # 256 MiB
+    con.execute("PRAGMA busy_timeout=30000;")      # 旧 timeout=30 相当
     ensure_schema(con)
     return con
 
@@ -191,15 +221,67 @@ def _colnames(con: sqlite3.Connection, table: str) -> List[str]:
     return [r[1] for r in con.execute(f"PRAGMA table_info({table});").fetchall()]
 
 
+def _excluded_is_generated(con: sqlite3.Connection) -> bool:
+    # table_xinfo の hidden: 2=VIRTUAL生成列 / 3=STORED生成列
+    for r in con.execute(f"PRAGMA table_xinfo({TABLE_ALL});").fetchall():
+        if r[1] == "excluded":
+            return r[6] in (2, 3)
+    return False
+
+
+def _rebuild_items_all(con: sqlite3.Connection, code_col: str) -> None:
+    """
+    items_all を最新DDLで作り直してデータを移す
+    - code_col: 旧テーブルでスレッドIDが入っている列（旧スキーマは id / 現行は code）
+    - 現行スキーマ（code 列あり）からの移行では id もそのまま引き継ぐ
+      （旧スキーマの id はスレッドIDなので、その場合だけ新しく採番させる）
+    - excluded は生成列なのでコピーしない / comment_average* は STEP2.5 で再計算
+    - index は入れ替え後に DDL_ITEMS_ALL で張り直す
+    """
+    id_sql = "id, " if (code_col != "id" and "id" in _colnames(con, TABLE_ALL)) else ""
+
+    tmp = f"{TABLE_ALL}__new"
+    con.execute(f"DROP TABLE IF EXISTS {tmp};")
+    con.commit()
+
+    con.executescript(
+        DDL_ITEMS_ALL_TABLE.replace(
+            f"CREATE TABLE IF NOT EXISTS {TABLE_ALL}",
+            f"CREATE TABLE IF NOT EXISTS {tmp}",
+        )
+    )
+    con.commit()
+
+    con.execute(
+        f"""
+        INSERT INTO {tmp} (
+          {id_sql}code, check_date, first_seen_at, first_post, last_post,
+          comments_count, category, title, out_auto, out_manual
+        )
+        SELECT
+          {id_sql}{code_col} AS code,
+          check_date, first_seen_at, first_post, last_post,
+          comments_count, category, title,
+          COALESCE(out_auto,0), COALESCE(out_manual,0)
+        FROM {TABLE_ALL}
+        """
+    )
+    con.commit()
+
+    # 旧テーブルを入れ替え（旧トリガー/indexはテーブルと一緒に消える）
+    con.execute(f"DROP TABLE {TABLE_ALL};")
+    con.execute(f"ALTER TABLE {tmp} RENAME TO {TABLE_ALL};")
+    con.commit()
+
+
 def ensure_schema(con: sqlite3.Connection) -> None:
     """
     - items_all 旧スキーマ（id TEXT PK）なら code へ移行して作り直し
+    - excluded が通常列（トリガー同期版）なら生成列へ作り直し
     - comment_average / priority の不足カラムは ALTER で追加
-    - excluded 同期トリガー作成
     """
     if _table_exists(con, TABLE_ALL):
-        cols = _colnames(con, TABLE_ALL)
-        colset = set(cols)
+        colset = set(_colnames(con, TABLE_ALL))
 
         # 旧: code が無く、id が存在 → id がスレッドIDだった
         if "code" not in colset and "id" in colset:
@@ -207,13 +289,15 @@ def ensure_schema(con: sqlite3.Connection) -> None:
             if "point_out" in colset and "out_auto" not in colset:
                 con.execute(f"ALTER TABLE {TABLE_ALL} RENAME COLUMN point_out TO out_auto;")
                 con.commit()
-                colset = set(_colnames(con, TABLE_ALL))
+                colset.discard("point_out")
+                colset.add("out_auto")
 
             # post_date -> last_post
             if "post_date" in colset and "last_post" not in colset:
                 con.execute(f"ALTER TABLE {TABLE_ALL} RENAME COLUMN post_date TO last_post;")
                 con.commit()
-                colset = set(_colnames(con, TABLE_ALL))
+                colset.discard("post_date")
+                colset.add("last_post")
 
             # 足りない列を追加（移行前に揃える）
             if "first_seen_at" not in colset:
@@ -224,8 +308,6 @@ def ensure_schema(con: sqlite3.Connection) -> None:
                 con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN out_auto INTEGER NOT NULL DEFAULT 0;")
             if "out_manual" not in colset:
                 con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN out_manual INTEGER NOT NULL DEFAULT 0;")
-            if "excluded" not in colset:
-                con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN excluded INTEGER NOT NULL DEFAULT 0;")
             con.commit()
 
             # first_seen_at が空なら check_date
@@ -236,48 +318,14 @@ def ensure_schema(con: sqlite3.Connection) -> None:
                  WHERE (first_seen_at IS NULL OR first_seen_at = '')
                 """
             )
-            # excluded 再計算
-            con.execute(
-                f"""
-                UPDATE {TABLE_ALL}
-                   SET excluded = CASE WHEN COALESCE(out_auto,0)=1 OR COALESCE(out_manual,0)=1 THEN 1 ELSE 0 END
-                """
-            )
-            con.commit()
-
-            # 新スキーマへ移行
-            tmp = f"{TABLE_ALL}__new"
-            con.execute(f"DROP TABLE IF EXISTS {tmp};")
             con.commit()
 
-            con.executescript(
-                DDL_ITEMS_ALL.replace(
-                    f"CREATE TABLE IF NOT EXISTS {TABLE_ALL}",
-                    f"CREATE TABLE IF NOT EXISTS {tmp}",
-                )
-            )
-            con.commit()
-
-            con.execute(
-                f"""
-                INSERT INTO {tmp} (
-                  code, check_date, first_seen_at, first_post, last_post,
-                  comments_count, category, title, out_auto, out_manual, excluded, comment_average, comment_average2
-                )
-                SELECT
-                  id AS code,
-                  check_date, first_seen_at, first_post, last_post,
-                  comments_count, category, title,
-                  COALESCE(out_auto,0), COALESCE(out_manual,0), COALESCE(excluded,0),
-                  NULL, NULL
-                FROM {TABLE_ALL}
-                """
-            )
-            con.commit()
+            # 旧 id(TEXT) → 新 code(TEXT UNIQUE)
+            _rebuild_items_all(con, "id")
 
-            con.execute(f"DROP TABLE {TABLE_ALL};")
-            con.execute(f"ALTER TABLE {tmp} RENAME TO {TABLE_ALL};")
-            con.commit()
+        # 現行スキーマだが excluded が通常列（トリガー同期版）→ 生成列へ作り直し
+        elif not _excluded_is_generated(con):
+            _rebuild_items_all(con, "code")
 
     # DDL 適用
     con.executescript(DDL_ITEMS_ALL)
@@ -285,51 +333,39 @@ def ensure_schema(con: sqlite3.Connection) -> None:
     con.commit()
 
     # 追加カラム補完（既存DB向け）
+    # PRAGMA table_info は1テーブル1回だけ。ALTER 後はローカルの集合を更新する
     cols_all = set(_colnames(con, TABLE_ALL))
     if "comment_average" not in cols_all:
         con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN comment_average REAL;")
         con.commit()
+        cols_all.add("comment_average")
 
-    cols_all = set(_colnames(con, TABLE_ALL))
     if "comment_average2" not in cols_all:
         con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN comment_average2 REAL;")
         con.commit()
+        cols_all.add("comment_average2")
 
     # comment_average2 用インデックス（既存DBで列追加後に作る）
     con.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_comment_average2 ON {TABLE_ALL}(comment_average2);")
+
+    # priority 採番用（excluded=0 の部分インデックス / code まで持たせて一時ソート無しで走査）
+    #  excluded 単独インデックスは 0/1 しかなく、これを選ばれると ORDER BY が一時B-treeになるので削除
+    con.execute(f"DROP INDEX IF EXISTS idx_{TABLE_ALL}_excluded;")
+    con.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_pri "
+        f"ON {TABLE_ALL}(comment_average DESC, first_post DESC, code) WHERE excluded=0;"
+    )
     con.commit()
 
     cols_do = set(_colnames(con, TABLE_DO))
     if "priority" not in cols_do:
         con.execute(f"ALTER TABLE {TABLE_DO} ADD COLUMN priority INTEGER NOT NULL DEFAULT 0;")
         con.commit()
+        cols_do.add("priority")
 
-    # excluded 同期トリガー
+    # 旧版の excluded 同期トリガー（生成列になったので不要）
     con.execute("DROP TRIGGER IF EXISTS trg_items_all_excluded_sync_ai;")
     con.execute("DROP TRIGGER IF EXISTS trg_items_all_excluded_sync_au;")
-
-    con.execute(
-        f"""
-        CREATE TRIGGER trg_items_all_excluded_sync_ai
-        AFTER INSERT ON {TABLE_ALL}
-        BEGIN
-          UPDATE {TABLE_ALL}
-             SET excluded = CASE WHEN NEW.out_auto=1 OR NEW.out_manual=1 THEN 1 ELSE 0 END
-           WHERE rowid = NEW.rowid;
-        END;
-        """
-    )
-    con.execute(
-        f"""
-        CREATE TRIGGER trg_items_all_excluded_sync_au
-        AFTER UPDATE OF out_auto, out_manual ON {TABLE_ALL}
-        BEGIN
-          UPDATE {TABLE_ALL}
-             SET excluded = CASE WHEN NEW.out_auto=1 OR NEW.out_manual=1 THEN 1 ELSE 0 END
-           WHERE rowid = NEW.rowid;
-        END;
-        """
-    )
     con.commit()
 
 
@@ -342,36 +378,94 @@ def get_excluded(con: sqlite3.Connection, code: str) -> int:
     return int(row[0] or 0) if row else 0
 
 
-def set_first_post_if_empty(con: sqlite3.Connection, code: str, first_post: str) -> None:
-    con.execute(
-        f"""
-        UPDATE {TABLE_ALL}
-           SET first_post = COALESCE(first_post, ?)
-         WHERE code=?;
-        """,
-        (first_post, code),
-    )
+# SQLITE_MAX_VARIABLE_NUMBER（古いビルドは 999）を超えないよう IN 句を分割する
+IN_CLAUSE_CHUNK = 500
 
 
-def upsert_items_all(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    sql = f"""
-    INSERT INTO {TABLE_ALL} (
-        code, check_date, first_seen_at, first_post, last_post,
-        comments_count, category, title, out_auto
-    )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(code) DO UPDATE SET
-      check_date=excluded.check_date,
-      first_seen_at=COALESCE({TABLE_ALL}.first_seen_at, excluded.first_seen_at),
-      first_post=COALESCE({TABLE_ALL}.first_post, excluded.first_post),
-      last_post=excluded.last_post,
-      comments_count=excluded.comments_count,
-      category=excluded.category,
-      title=excluded.title,
-      out_auto=excluded.out_auto
+def _select_codes_in(con: sqlite3.Connection, where: str, codes: List[str]) -> Set[str]:
+    found: Set[str] = set()
+    for i in range(0, len(codes), IN_CLAUSE_CHUNK):
+        chunk = codes[i : i + IN_CLAUSE_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        found.update(
+            r[0]
+            for r in con.execute(
+                f"SELECT code FROM {TABLE_ALL} WHERE {where} code IN ({marks})",
+                chunk,
+            )
+        )
+    return found
+
+
+def existing_codes_in(con: sqlite3.Connection, codes: List[str]) -> Set[str]:
+    """codes のうち items_all に既にあるもの"""
+    return _select_codes_in(con, "", codes)
+
+
+def excluded_codes_in(con: sqlite3.Connection, codes: List[str]) -> Set[str]:
+    """codes のうち excluded=1 のもの"""
+    return _select_codes_in(con, "excluded=1 AND", codes)
+
+
+_SET_FIRST_POST_SQL = f"""
+UPDATE {TABLE_ALL}
+   SET first_post = COALESCE(first_post, ?)
+ WHERE code=?;
+"""
+
+
+def set_first_post_if_empty_many(con: sqlite3.Connection, pairs: List[Tuple[str, str]]) -> None:
     """
-    con.execute(
-        sql,
+    pairs: [(first_post, code), ...] をまとめて反映（first_post が空の行だけ埋める）して commit
+    """
+    if not pairs:
+        return
+    con.executemany(_SET_FIRST_POST_SQL, pairs)
+    con.commit()
+
+
+_UPSERT_ITEMS_ALL_SQL = f"""
+INSERT INTO {TABLE_ALL} (
+    code, check_date, first_seen_at, first_post, last_post,
+    comments_count, category, title, out_auto
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(code) DO UPDATE SET
+  check_date=excluded.check_date,
+  first_seen_at=COALESCE({TABLE_ALL}.first_seen_at, excluded.first_seen_at),
+  first_post=COALESCE({TABLE_ALL}.first_post, excluded.first_post),
+  last_post=excluded.last_post,
+  comments_count=excluded.comments_count,
+  category=excluded.category,
+  title=excluded.title,
+  out_auto=excluded.out_auto
+RETURNING code, first_seen_at
+"""
+
+
+def begin(con: sqlite3.Connection) -> None:
+    """書き込みトランザクション開始（既に開いていれば何もしない）"""
+    if not con.in_transaction:
+        con.execute("BEGIN IMMEDIATE;")
+
+
+def checkpoint(con: sqlite3.Connection) -> None:
+    """commit して WAL を本体へ書き戻す（PASSIVE：読み手は待たせない）"""
+    con.commit()
+    con.execute("PRAGMA wal_checkpoint(PASSIVE);")
+
+
+def upsert_items_all_many(con: sqlite3.Connection, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    ページ分の行をまとめて UPSERT し、新規INSERTだった code を返す（commit は呼び出し側）
+
+    既存行は first_seen_at を保持するので、RETURNING の値が今回の first_seen_at のままなら新規。
+    RETURNING の結果を受け取るため executemany ではなく行ごとに execute する。
+    """
+    inserted: Set[str] = set()
+    if not rows:
+        return inserted
+    params = [
         (
             row["code"],
             row["check_date"],
@@ -382,8 +476,14 @@ def upsert_items_all(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
             row["category"],
             row["title"],
             int(row["out_auto"]),
-        ),
-    )
+        )
+        for row in rows
+    ]
+    for param, row in zip(params, rows):
+        code, first_seen_at = con.execute(_UPSERT_ITEMS_ALL_SQL, param).fetchone()
+        if first_seen_at == row["first_seen_at"]:
+            inserted.add(code)
+    return inserted
 
 
 def recompute_comment_average(con: sqlite3.Connection) -> None:
@@ -393,34 +493,36 @@ def recompute_comment_average(con: sqlite3.Connection) -> None:
 
     例:
       1/7 19:20 - 1/5 23:20 -> date差は 2日 なので days=2
+
+    julianday() の差は CTE で1行1回だけ計算する（CASE の各分岐で再計算しない）。
+    commit しない（続く sync_items_do_from_all と同じトランザクションで確定する）。
     """
     con.execute(
         f"""
+        WITH d AS (
+          SELECT
+            rowid AS rid,
+            comments_count,
+            CASE
+              WHEN first_post IS NULL OR first_post='' THEN NULL
+              WHEN last_post  IS NULL OR last_post ='' THEN NULL
+              ELSE (julianday(last_post) - julianday(first_post)) * 24.0 * 60.0
+            END AS mins,
+            CASE
+              WHEN first_post IS NULL OR first_post='' THEN NULL
+              WHEN last_post  IS NULL OR last_post ='' THEN NULL
+              ELSE (julianday(date(last_post)) - julianday(date(first_post))) + 1
+            END AS days
+          FROM {TABLE_ALL}
+        )
         UPDATE {TABLE_ALL}
            SET
-             comment_average =
-               CASE
-                 WHEN first_post IS NULL OR first_post='' THEN NULL
-                 WHEN last_post  IS NULL OR last_post ='' THEN NULL
-                 ELSE
-                   CASE
-                     WHEN (julianday(last_post) - julianday(first_post)) * 24.0 * 60.0 <= 0 THEN NULL
-                     ELSE ROUND((comments_count * 1.0) / ((julianday(last_post) - julianday(first_post)) * 24.0 * 60.0), 2)
-                   END
-               END,
-             comment_average2 =
-               CASE
-                 WHEN first_post IS NULL OR first_post='' THEN NULL
-                 WHEN last_post  IS NULL OR last_post ='' THEN NULL
-                 ELSE
-                   CASE
-                     WHEN ((julianday(date(last_post)) - julianday(date(first_post))) + 1) <= 0 THEN NULL
-                     ELSE ROUND((comments_count * 1.0) / ((julianday(date(last_post)) - julianday(date(first_post))) + 1), 2)
-                   END
-               END
+             comment_average  = CASE WHEN d.mins > 0 THEN ROUND((d.comments_count * 1.0) / d.mins, 2) END,
+             comment_average2 = CASE WHEN d.days > 0 THEN ROUND((d.comments_count * 1.0) / d.days, 2) END
+          FROM d
+         WHERE {TABLE_ALL}.rowid = d.rid
         """
     )
-    con.commit()
 
 
 def sync_items_do_from_all(con: sqlite3.Connection) -> None:
@@ -462,7 +564,8 @@ def sync_items_do_from_all(con: sqlite3.Connection) -> None:
     )
     deleted_missing = con.execute("SELECT changes();").fetchone()[0]
 
-    # priority 再計算（NULLは最後）
+    # 直前の削除で items_do は「items_all にある excluded=0」だけになっているので、全行が ranked に一致する
+    # priority 再計算（NULLは最後：SQLite は DESC で NULL が末尾になる → idx_..._pri をそのまま走査）
     con.execute(
         f"""
         WITH ranked AS (
@@ -470,17 +573,16 @@ def sync_items_do_from_all(con: sqlite3.Connection) -> None:
             code,
             ROW_NUMBER() OVER (
               ORDER BY
-                (comment_average IS NULL) ASC,
                 comment_average DESC,
-                (first_post IS NULL) ASC,
                 first_post DESC
             ) AS pr
           FROM {TABLE_ALL}
           WHERE excluded = 0
         )
         UPDATE {TABLE_DO}
-           SET priority = (SELECT pr FROM ranked WHERE ranked.code = {TABLE_DO}.code)
-         WHERE code IN (SELECT code FROM ranked)
+           SET priority = ranked.pr
+          FROM ranked
+         WHERE {TABLE_DO}.code = ranked.code
         """
     )
     pr_updated = con.execute("SELECT changes();").fetchone()[0]
@@ -499,7 +601,7 @@ def sync_items_do_from_all(con: sqlite3.Connection) -> None:
 # 変換/判定
 # =========================================================
 def digits_only_int(s: str) -> int:
-    nums = re.findall(r"\d+", (s or "").replace(",", ""))
+    nums = RE_DIGITS.findall((s or "").replace(",", ""))
     return int("".join(nums)) if nums else 0
 
 
@@ -507,6 +609,18 @@ def normalize_list_datetime(raw: str) -> str:
     txt = (raw or "").strip()
     if not txt:
         return "1970-01-01 00:00:00"
+
+    # 既知の書式は正規表現で直接組み立てる（dateutil の fuzzy 解析は遅い）
+    m = RE_LIST_DT.match(txt)
+    if m:
+        y, mo, d, hh, mi, ss = m.groups()
+        try:
+            year = int(y) if y else datetime.now(ZoneInfo("Asia/Tokyo")).year
+            dt = datetime(year, int(mo), int(d), int(hh), int(mi), int(ss or 0))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
     try:
         dt = dtparser.parse(txt, fuzzy=True)
         return dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -515,7 +629,8 @@ def normalize_list_datetime(raw: str) -> str:
 
 
 def parse_first_post_from_text(body_text: str) -> str | None:
-    t = (body_text or "").replace("\r\n", "\n").replace("\r", "\n")
+    # \r\n は \n\n になるが、日付と時刻は同一行で拾うので結果は変わらない
+    t = (body_text or "").replace("\r", "\n")
     m = RE_FIRSTPOST_ANY.search(t)
     if not m:
         return None
@@ -523,16 +638,9 @@ def parse_first_post_from_text(body_text: str) -> str | None:
     return f"{y}-{mo}-{d} {hh}:{mm}:{ss}"
 
 
+@lru_cache(maxsize=4096)
 def should_out_auto(title: str) -> int:
-    t = title or ""
-    if "PART" in t.upper():
-        return 1
-    for w in OUT_AUTO_WORDS:
-        if w in ("Part", "PART"):
-            continue
-        if w and (w in t):
-            return 1
-    return 0
+    return 1 if RE_OUT_AUTO.search(title or "") else 0
 
 
 def build_page_url(cfg: CategoryConfig, page_no: int) -> str:
@@ -554,18 +662,53 @@ def short(s: str, n: int = 70) -> str:
     return s if len(s) <= n else s[: n - 1] + "…"
 
 
-def fetch_first_post_via_comment1(detail_page, thread_code: str) -> str | None:
+# 一覧ページの li を1回の evaluate でまとめて抜く（li ごとの CDP 往復をなくす）
+# code（/topics/<数字>/ の数字）も JS 側で切り出す
+# 取れない項目は null（Python 側で failed_item 扱い）
+JS_LIST_ROWS = r"""
+() => {
+  const first = (xp, ctx) => document.evaluate(
+    xp, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+  ).singleNodeValue;
+  const text = (xp, ctx) => {
+    const n = first(xp, ctx);
+    return n ? n.innerText : null;
+  };
+  const snap = document.evaluate(
+    "/html/body/div[1]/div[1]/div[1]/ul[2]/li", document, null,
+    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+  );
+  const out = [];
+  for (let i = 0; i < snap.snapshotLength; i++) {
+    const li = snap.snapshotItem(i);
+    const a = first("./a", li);
+    const m = a ? (a.getAttribute("href") || "").match(/\/topics\/(\d+)\//) : null;
+    out.push({
+      code: m ? m[1] : null,
+      c: text("./a/div/p/span[2]", li),
+      last: text("./a/div/p/span[3]", li),
+      title: text("./a/p", li),
+    });
+  }
+  return out;
+}
+"""
+
+
+async def fetch_first_post_via_comment1(detail_page, thread_code: str) -> str | None:
     url = f"https://girlschannel.net/comment/{thread_code}/1/"
     try:
-        resp = detail_page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_FIRSTPOST_GOTO)
+        resp = await detail_page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_FIRSTPOST_GOTO)
         status = resp.status if resp else None
         if not resp or (status and status >= 400):
             return None
     except PWTimeoutError:
         return None
+    except Exception:
+        return None
 
     try:
-        body_txt = detail_page.locator("body").inner_text(timeout=TIMEOUT_MS_FIRSTPOST_TEXT)
+        body_txt = await detail_page.locator("body").inner_text(timeout=TIMEOUT_MS_FIRSTPOST_TEXT)
     except PWTimeoutError:
         return None
     except Exception:
@@ -574,18 +717,63 @@ def fetch_first_post_via_comment1(detail_page, thread_code: str) -> str | None:
     return parse_first_post_from_text(body_txt)
 
 
-def install_request_blocking(page) -> None:
+async def fetch_first_posts(codes: List[str]) -> Dict[str, str | None]:
+    """
+    codes の first_post を DETAIL_CONCURRENCY ページで並列取得（code -> first_post / 取れなければ None）
+    ※ sync API はスレッドを跨いで使えないので async API のページを並べる
+    """
+    results: Dict[str, str | None] = {}
+    if not codes:
+        return results
+
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for code in codes:
+        queue.put_nowait(code)
+
+    async def _worker(detail_page) -> None:
+        while True:
+            try:
+                code = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            results[code] = await fetch_first_post_via_comment1(detail_page, code)
+            if DETAIL_SLEEP_SEC > 0:
+                await asyncio.sleep(DETAIL_SLEEP_SEC)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=HEADLESS)
+        context = await browser.new_context(locale="ja-JP")
+        await install_request_blocking_async(context)
+        try:
+            pages = []
+            for _ in range(max(1, min(DETAIL_CONCURRENCY, len(codes)))):
+                pages.append(await context.new_page())
+            await asyncio.gather(*(_worker(pg) for pg in pages))
+        finally:
+            await context.close()
+            await browser.close()
+
+    return results
+
+
+def install_request_blocking(context) -> None:
+    """
+    context 単位で、拡張子が RE_BLOCK_URL に当たるリクエストだけ route する
+    （当たらないリクエストは Python のハンドラを経由しない）
+    """
     if not REQUEST_BLOCK:
         return
+    try:
+        context.route(RE_BLOCK_URL, lambda route, _request: route.abort())
+    except Exception:
+        pass
 
-    def _route_handler(route, request):
-        rtype = request.resource_type
-        if rtype in ("image", "media", "font", "stylesheet"):
-            return route.abort()
-        return route.continue_()
 
+async def install_request_blocking_async(context) -> None:
+    if not REQUEST_BLOCK:
+        return
     try:
-        page.route("**/*", _route_handler)
+        await context.route(RE_BLOCK_URL, lambda route, _request: route.abort())
     except Exception:
         pass
 
@@ -622,6 +810,7 @@ def main() -> int:
     out_auto_ones = 0
 
     newly_inserted_codes: List[str] = []
+    newly_inserted_set: Set[str] = set()
     first_post_filled = 0
     first_post_failed = 0
     first_post_skipped = 0
@@ -630,172 +819,196 @@ def main() -> int:
     print(f"[INFO] tables: {TABLE_ALL}, {TABLE_DO}, {TABLE_DONE}")
     print(f"[INFO] run_dt: {run_dt}")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        context = browser.new_context(locale="ja-JP")
-        page = context.new_page()
-        detail_page = context.new_page()
-
-        install_request_blocking(page)
-        install_request_blocking(detail_page)
-
-        try:
-            pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved")
-
-            # STEP 1: list -> items_all
-            for cfg in enabled_categories:
-                if saved >= TARGET_NEW_COUNT:
-                    break
-
-                print(f"\n[CATEGORY] {cfg.name}")
-                consecutive_no_save_pages = 0
-
-                for page_no in range(PAGE_FROM, PAGE_TO + 1):
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=HEADLESS)
+            context = browser.new_context(locale="ja-JP")
+            install_request_blocking(context)
+            page = context.new_page()
+
+            try:
+                # ECHO_EACH_SAVE 時は行ごとの print と混ざるのでバーは出さない
+                pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved", mininterval=0.5, miniters=10, disable=ECHO_EACH_SAVE)
+
+                # STEP 1: list -> items_all
+                #  書き込みトランザクションはページごとの UPSERT の間だけ開く（page.goto/sleep 中はロックを持たない）
+                #  CHECKPOINT_EVERY_PAGES ごとに WAL checkpoint
+                pages_since_checkpoint = 0
+                for cfg in enabled_categories:
                     if saved >= TARGET_NEW_COUNT:
                         break
 
-                    url = build_page_url(cfg, page_no)
+                    print(f"\n[CATEGORY] {cfg.name}")
+                    consecutive_no_save_pages = 0
 
-                    try:
-                        resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_LIST)
-                        status = resp.status if resp else None
-                        if (not resp) or (status and status >= 400):
-                            failed_page += 1
-                            print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
-                            time.sleep(SLEEP_SEC)
-                            continue
-                    except PWTimeoutError:
-                        failed_page += 1
-                        print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
-                        time.sleep(SLEEP_SEC)
-                        continue
-
-                    li = page.locator("xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li")
-                    li_count = li.count()
-                    if li_count == 0:
-                        break
-
-                    page_rows: List[Tuple[int, Dict[str, Any], bool]] = []
-
-                    for idx in range(1, li_count + 1):
-                        seen += 1
+                    for page_no in range(PAGE_FROM, PAGE_TO + 1):
+                        if saved >= TARGET_NEW_COUNT:
+                            break
 
-                        a = page.locator(f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a").first
-                        href = a.get_attribute("href") or ""
-                        m = RE_TOPIC_HREF.search(href)
-                        if not m:
-                            failed_item += 1
-                            continue
-                        code = m.group(1)
+                        url = build_page_url(cfg, page_no)
 
                         try:
-                            comments_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[2]"
-                            ).first.inner_text(timeout=5000).strip()
-                            last_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[3]"
-                            ).first.inner_text(timeout=5000).strip()
-                            title = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/p"
-                            ).first.inner_text(timeout=5000).strip()
+                            resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_LIST)
+                            status = resp.status if resp else None
+                            if (not resp) or (status and status >= 400):
+                                failed_page += 1
+                                print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
+                                time.sleep(SLEEP_SEC)
+                                continue
                         except PWTimeoutError:
-                            failed_item += 1
-                            continue
-
-                        comments_count = digits_only_int(comments_raw)
-                        if comments_count < MIN_COMMENTS:
-                            under_min += 1
+                            failed_page += 1
+                            print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
+                            time.sleep(SLEEP_SEC)
                             continue
 
-                        already = exists_code(con, code)
-                        if (not UPDATE_EXISTING) and already:
+                        try:
+                            list_rows = page.evaluate(JS_LIST_ROWS)
+                        except Exception as e:
+                            failed_page += 1
+                            print(f"[PAGE_EVAL_FAIL] cat={cfg.name} page={page_no} url={url} err={e}")
+                            time.sleep(SLEEP_SEC)
                             continue
-
-                        last_post = normalize_list_datetime(last_raw)
-                        out_auto = should_out_auto(title)
-
-                        row: Dict[str, Any] = {
-                            "code": code,
-                            "check_date": run_dt,
-                            "first_seen_at": run_dt,
-                            "first_post": None,
-                            "last_post": last_post,
-                            "comments_count": comments_count,
-                            "category": cfg.name,
-                            "title": title,
-                            "out_auto": out_auto,
-                        }
-                        page_rows.append((idx, row, already))
-
-                    # そのページ内の並びを安定化（コメント数降順→last_post昇順）
-                    page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["last_post"])))
-
-                    page_saved = 0
-                    for orig_idx, row, already in page_rows:
-                        if saved >= TARGET_NEW_COUNT:
+                        if not list_rows:
                             break
-                        upsert_items_all(con, row)
-                        con.commit()
 
-                        saved += 1
-                        page_saved += 1
-                        pbar.update(1)
-
-                        if row["out_auto"] == 1:
-                            out_auto_ones += 1
+                        # (idx, code, comments_count, last_raw, title)
+                        candidates: List[Tuple[int, str, int, str, str]] = []
+
+                        for idx, item in enumerate(list_rows, start=1):
+                            seen += 1
+
+                            code = item.get("code")
+                            if not code:
+                                failed_item += 1
+                                continue
+
+                            comments_raw = item.get("c")
+                            last_raw = item.get("last")
+                            title = item.get("title")
+                            if comments_raw is None or last_raw is None or title is None:
+                                failed_item += 1
+                                continue
+                            comments_raw = comments_raw.strip()
+                            last_raw = last_raw.strip()
+                            title = title.strip()
+
+                            comments_count = digits_only_int(comments_raw)
+                            if comments_count < MIN_COMMENTS:
+                                under_min += 1
+                                continue
+
+                            candidates.append((idx, code, comments_count, last_raw, title))
+
+                        # UPDATE_EXISTING=False のときだけ既存を先に除外（保存枠を消費させない）
+                        #  新規/更新の判定自体は UPSERT の RETURNING で行う
+                        if not UPDATE_EXISTING:
+                            existing = existing_codes_in(con, [c[1] for c in candidates])
+                            candidates = [c for c in candidates if c[1] not in existing]
+
+                        # ((並び替えキー), idx, row)
+                        page_rows: List[Tuple[Tuple[int, str], int, Dict[str, Any]]] = []
+                        for idx, code, comments_count, last_raw, title in candidates:
+                            last_post = normalize_list_datetime(last_raw)
+                            out_auto = should_out_auto(title)
+
+                            row: Dict[str, Any] = {
+                                "code": code,
+                                "check_date": run_dt,
+                                "first_seen_at": run_dt,
+                                "first_post": None,
+                                "last_post": last_post,
+                                "comments_count": comments_count,
+                                "category": cfg.name,
+                                "title": title,
+                                "out_auto": out_auto,
+                            }
+                            page_rows.append(((-comments_count, last_post), idx, row))
+
+                        # そのページ内の並びを安定化（コメント数降順→last_post昇順）
+                        page_rows.sort(key=operator.itemgetter(0))
+
+                        # 残り枠ぶんだけ 1トランザクションでまとめて保存（ページごとに commit）
+                        page_rows = page_rows[: TARGET_NEW_COUNT - saved]
+                        begin(con)
+                        inserted = upsert_items_all_many(con, [row for _, _, row in page_rows])
+                        con.commit()
 
-                        if already:
-                            updated_ct += 1
+                        page_saved = 0
+                        for _, orig_idx, row in page_rows:
+                            saved += 1
+                            page_saved += 1
+
+                            if row["out_auto"] == 1:
+                                out_auto_ones += 1
+
+                            # 同一実行内で2回目に出てきた code は更新扱い
+                            if row["code"] in inserted and row["code"] not in newly_inserted_set:
+                                new_inserts += 1
+                                newly_inserted_codes.append(row["code"])
+                                newly_inserted_set.add(row["code"])
+                            else:
+                                updated_ct += 1
+
+                            if ECHO_EACH_SAVE:
+                                print(
+                                    f"[OK] {cfg.name} p{page_no} li{orig_idx} code={row['code']} "
+                                    f"c={row['comments_count']} out_auto={row['out_auto']} "
+                                    f"title={short(row['title'], 60)}"
+                                )
+
+                        if page_saved:
+                            pbar.update(page_saved)
+
+                        pages_since_checkpoint += 1
+                        if pages_since_checkpoint >= CHECKPOINT_EVERY_PAGES:
+                            checkpoint(con)
+                            pages_since_checkpoint = 0
+
+                        if page_saved == 0:
+                            consecutive_no_save_pages += 1
+                            if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
+                                break
                         else:
-                            new_inserts += 1
-                            newly_inserted_codes.append(row["code"])
-
-                        if ECHO_EACH_SAVE:
-                            print(
-                                f"[OK] {cfg.name} p{page_no} li{orig_idx} code={row['code']} "
-                                f"c={row['comments_count']} out_auto={row['out_auto']} "
-                                f"title={short(row['title'], 60)}"
-                            )
-
-                    if page_saved == 0:
-                        consecutive_no_save_pages += 1
-                        if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
-                            break
-                    else:
-                        consecutive_no_save_pages = 0
-
-                    time.sleep(SLEEP_SEC)
-
-            pbar.close()
-
-            # STEP 2: first_post（新規＆excluded=0のみ）
-            print("\n[STEP2] fetch first_post (newly inserted & excluded=0)")
-            for code in newly_inserted_codes:
-                if get_excluded(con, code) == 1:
-                    first_post_skipped += 1
-                    continue
-                fp = fetch_first_post_via_comment1(detail_page, code)
-                if fp:
-                    set_first_post_if_empty(con, code, fp)
-                    con.commit()
-                    first_post_filled += 1
-                else:
-                    first_post_failed += 1
-                if DETAIL_SLEEP_SEC > 0:
-                    time.sleep(DETAIL_SLEEP_SEC)
-
-            # STEP 2.5: comment_average
-            print("\n[STEP2.5] recompute comment_average")
-            recompute_comment_average(con)
-
-            # STEP 3: items_do sync + priority
-            print("\n[STEP3] sync items_do + priority")
-            sync_items_do_from_all(con)
+                            consecutive_no_save_pages = 0
 
-        finally:
-            con.close()
-            context.close()
-            browser.close()
+                        time.sleep(SLEEP_SEC)
+
+                checkpoint(con)
+                pbar.close()
+            finally:
+                context.close()
+                browser.close()
+
+        # STEP 2: first_post（新規＆excluded=0のみ）
+        #  - STEP1 のブラウザを閉じてから async で DETAIL_CONCURRENCY 本並列に取る
+        print("\n[STEP2] fetch first_post (newly inserted & excluded=0)")
+        excluded_codes = excluded_codes_in(con, newly_inserted_codes)
+        targets = [c for c in newly_inserted_codes if c not in excluded_codes]
+        first_post_skipped = len(newly_inserted_codes) - len(targets)
+
+        fetched = asyncio.run(fetch_first_posts(targets))
+        first_post_pairs: List[Tuple[str, str]] = []
+        for code in targets:
+            fp = fetched.get(code)
+            if fp:
+                first_post_pairs.append((fp, code))
+                first_post_filled += 1
+            else:
+                first_post_failed += 1
+        set_first_post_if_empty_many(con, first_post_pairs)
+
+        # STEP 2.5 + 3: comment_average 再計算 → items_do sync + priority（1トランザクション）
+        print("\n[STEP2.5] recompute comment_average")
+        recompute_comment_average(con)
+
+        print("\n[STEP3] sync items_do + priority")
+        sync_items_do_from_all(con)
+
+    finally:
+        # 途中で例外 → 未 commit 分は捨てる
+        if con.in_transaction:
+            con.rollback()
+        con.close()
 
     print("\n[SUMMARY]")
     print(f"  saved={saved}/{TARGET_NEW_COUNT} new={new_inserts} updated={updated_ct}")
@@ -3,17 +3,21 @@
 
 from __future__ import annotations
 
+import asyncio
 import re
 import time
 from dataclasses import dataclass
+from functools import lru_cache
+from html.parser import HTMLParser
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Set, Tuple
 import sqlite3
 from zoneinfo import ZoneInfo
 
 from tqdm import tqdm
 from dateutil import parser as dtparser
+from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 
 # =========================================================
@@ -39,11 +43,18 @@ UPDATE_EXISTING = True           # 既存Codeも更新する（最新状態保
 # Playwright
 HEADLESS = True
 TIMEOUT_MS_LIST = 30000          # 一覧ページはそこそこ長め
-TIMEOUT_MS_FIRSTPOST_GOTO = 12000
-TIMEOUT_MS_FIRSTPOST_TEXT = 3000
+TIMEOUT_MS_FIRSTPOST_GOTO = 12000  # comment/1 の HTTP 取得タイムアウト
 SLEEP_SEC = 0.6                  # 一覧ページ間隔
 REQUEST_BLOCK = True             # 画像/CSS/フォント等をブロックして高速化
-DETAIL_SLEEP_SEC = 0.05          # first_post 取得間隔（短め）
+BLOCK_SCRIPT_ON_LIST = True      # 一覧は静的HTMLから取れるので script も止める（一覧が0件になるなら False）
+DETAIL_SLEEP_SEC = 0.05          # first_post 取得間隔（短め・ページごと）
+DETAIL_CONCURRENCY = 4           # first_post 取得の同時リクエスト数
+FIRST_POST_WRITE_BATCH = 200     # first_post を DB に反映する件数単位（executemany + commit）
+
+# items_do / items_done を WITHOUT ROWID 版へ移行するか
+#  v10 も同じ DB を使い、items_do/items_done を id INTEGER PRIMARY KEY（+ priority）で参照している。
+#  v10 を同じ DB で使う間は False のまま（このスクリプトは id 版のテーブルでもそのまま動く）
+MIGRATE_DO_DONE_WITHOUT_ROWID = False
 
 # ログ/早期終了
 ECHO_EACH_SAVE = True
@@ -76,6 +87,24 @@ ENABLED_CATEGORY_INDEXES: List[int] = [0, 1]
 # =========================================================
 RE_TOPIC_HREF = re.compile(r"/topics/(\d+)/")
 
+# 解析/広告系（リクエストごと止める）
+RE_BLOCK_HOST = re.compile(
+    r"(google-analytics|googletagmanager|googlesyndication|doubleclick|adservice|amazon-adsystem)"
+)
+
+# out_auto 判定：OUT_AUTO_WORDS を1本の正規表現にまとめる（PART だけ大文字小文字を無視）
+RE_OUT_AUTO = re.compile(
+    "|".join(
+        ["(?i:PART)"]
+        + [re.escape(w) for w in OUT_AUTO_WORDS if w and w not in ("Part", "PART")]
+    )
+)
+
+# 一覧の日時（例: 2026/01/03 09:26 / 2026/01/03(土) 09:26:43）。外れたら dateutil に回す
+RE_LIST_DT = re.compile(
+    r"(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?:\s*\([^)]*\))?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?"
+)
+
 # commentページの本文から、最初に見つかった日時っぽい文字列を拾う（例: 2026/01/03(土) 09:26:43）
 RE_FIRSTPOST_ANY = re.compile(
     r"(\d{4})/(\d{2})/(\d{2}).*?(\d{2}):(\d{2}):(\d{2})"
@@ -113,7 +142,22 @@ CATEGORIES: List[CategoryConfig] = [
 #  - スレッドIDは code 列に格納
 #  - id は INTEGER PRIMARY KEY（自動採番）
 #  - code は UNIQUE（items_all だけ code の一意性を担保）
+#    ※ UNIQUE 制約の自動インデックスがあるので code 用の索引は別に作らない
+#  - out_auto / out_manual 単体の索引は参照クエリが無いので作らない
+#  - excluded は out_auto/out_manual から計算する生成列（トリガー不要）
+#    ※ 2値しかないので索引は作らない
 # =========================================================
+
+# スキーマ版数（PRAGMA user_version）。DDL を変えたら上げる
+SCHEMA_VERSION = 4
+
+# 旧DDLで作っていた不要インデックス（ensure_schema で削除）
+OBSOLETE_INDEXES_ALL = [
+    f"idx_{TABLE_ALL}_code",
+    f"idx_{TABLE_ALL}_out_auto",
+    f"idx_{TABLE_ALL}_out_manual",
+    f"idx_{TABLE_ALL}_excluded",
+]
 DDL_ITEMS_ALL = f"""
 CREATE TABLE IF NOT EXISTS {TABLE_ALL} (
   id INTEGER PRIMARY KEY,
@@ -127,19 +171,17 @@ CREATE TABLE IF NOT EXISTS {TABLE_ALL} (
   title TEXT NOT NULL,
   out_auto INTEGER NOT NULL DEFAULT 0,
   out_manual INTEGER NOT NULL DEFAULT 0,
-  excluded INTEGER NOT NULL DEFAULT 0
+  excluded INTEGER GENERATED ALWAYS AS (
+    CASE WHEN out_auto=1 OR out_manual=1 THEN 1 ELSE 0 END
+  ) VIRTUAL
 );
 
-CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_code ON {TABLE_ALL}(code);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_check_date ON {TABLE_ALL}(check_date);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_first_seen_at ON {TABLE_ALL}(first_seen_at);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_first_post ON {TABLE_ALL}(first_post);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_last_post ON {TABLE_ALL}(last_post);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_comments ON {TABLE_ALL}(comments_count);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_category ON {TABLE_ALL}(category);
-CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_out_auto ON {TABLE_ALL}(out_auto);
-CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_out_manual ON {TABLE_ALL}(out_manual);
-CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_excluded ON {TABLE_ALL}(excluded);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_sort_cc_desc_lp_asc
   ON {TABLE_ALL}(comments_count DESC, last_post ASC);
 """
@@ -148,27 +190,29 @@ CREATE INDEX IF NOT EXISTS idx_{TABLE_ALL}_sort_cc_desc_lp_asc
 # DDL（items_do / items_done）
 #  ★ユーザー指定:
 #   - テーブル名：items_do / items_done
-#   - do: id カラムを PRIMARY KEY、created_at/update_at は不要
-#   - done: id カラムを PRIMARY KEY
+#   - do: created_at/update_at は不要
 #
-#  実運用上、同期(upsert)のため code を UNIQUE にする（禁止されていないので採用）
+#  code（スレッドID）を PRIMARY KEY にした WITHOUT ROWID テーブル
+#   - 同期/参照はすべて code なので、rowid 用の B-tree を持たない
+#   - 旧版の id INTEGER PRIMARY KEY 列は廃止
+#     （ensure_schema での移行は MIGRATE_DO_DONE_WITHOUT_ROWID=True のときだけ）
 # =========================================================
-DDL_DO_DONE = f"""
+DDL_DO = f"""
 CREATE TABLE IF NOT EXISTS {TABLE_DO} (
-  id INTEGER PRIMARY KEY,
-  code TEXT NOT NULL UNIQUE,              -- スレッドID（items_all.code）: 同期のため一意
+  code TEXT PRIMARY KEY,                  -- スレッドID（items_all.code）
   title TEXT NOT NULL,
   status TEXT NOT NULL DEFAULT 'queued',  -- queued / working / done 等（運用で拡張OK）
   step INTEGER NOT NULL DEFAULT 0,        -- 工程番号（運用で定義）
   last_error TEXT,
   retry_count INTEGER NOT NULL DEFAULT 0
-);
+) WITHOUT ROWID;
 
 CREATE INDEX IF NOT EXISTS idx_{TABLE_DO}_status ON {TABLE_DO}(status);
+"""
 
+DDL_DONE = f"""
 CREATE TABLE IF NOT EXISTS {TABLE_DONE} (
-  id INTEGER PRIMARY KEY,
-  code TEXT NOT NULL UNIQUE,              -- スレッドID（items_all.code）: 1動画=1投稿管理を想定
+  code TEXT PRIMARY KEY,                  -- スレッドID（items_all.code）: 1動画=1投稿管理を想定
   title TEXT NOT NULL,
 
   done_at TEXT NOT NULL DEFAULT (datetime('now')),   -- 完了時刻（不要なら後で削除OK）
@@ -182,21 +226,35 @@ CREATE TABLE IF NOT EXISTS {TABLE_DONE} (
   tiktok_url TEXT,
 
   notes TEXT
-);
+) WITHOUT ROWID;
 
 CREATE INDEX IF NOT EXISTS idx_{TABLE_DONE}_done_at ON {TABLE_DONE}(done_at);
 CREATE INDEX IF NOT EXISTS idx_{TABLE_DONE}_updated_at ON {TABLE_DONE}(updated_at);
 """
 
+DDL_DO_DONE = DDL_DO + DDL_DONE
+
 # =========================================================
 # DBユーティリティ
 # =========================================================
+# このプロセス内で ensure_schema 済みの DB -> その時点の PRAGMA schema_version
+#  （schema_version が変わっていなければ、2回目以降の connect は何も確認しない）
+_SCHEMA_VERSION_SEEN: Dict[Path, int] = {}
+
 def connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(str(db_path), timeout=30)
     con.execute("PRAGMA journal_mode=WAL;")
     con.execute("PRAGMA synchronous=NORMAL;")
-    ensure_schema(con)
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA cache_size=-20000;")        # 約20MB
+    con.execute("PRAGMA mmap_size=268435456;")      # 256MB
+
+    key = db_path.resolve()
+    sv = con.execute("PRAGMA schema_version;").fetchone()[0]
+    if _SCHEMA_VERSION_SEEN.get(key) != sv:
+        ensure_schema(con)
+        _SCHEMA_VERSION_SEEN[key] = con.execute("PRAGMA schema_version;").fetchone()[0]
     return con
 
 def _table_exists(con: sqlite3.Connection, name: str) -> bool:
@@ -209,12 +267,109 @@ def _table_exists(con: sqlite3.Connection, name: str) -> bool:
 def _colnames(con: sqlite3.Connection, table: str) -> List[str]:
     return [r[1] for r in con.execute(f"PRAGMA table_info({table});").fetchall()]
 
+def _excluded_is_generated(con: sqlite3.Connection) -> bool:
+    # table_xinfo の hidden: 2=VIRTUAL生成列 / 3=STORED生成列
+    for r in con.execute(f"PRAGMA table_xinfo({TABLE_ALL});").fetchall():
+        if r[1] == "excluded":
+            return r[6] in (2, 3)
+    return False
+
+def _rebuild_items_all(con: sqlite3.Connection, code_col: str) -> None:
+    """
+    items_all を最新DDLで作り直してデータを移す
+    - code_col: 旧テーブルでスレッドIDが入っている列（旧スキーマは id / 現行は code）
+    - 現行スキーマ（code 列あり）からの移行では id もそのまま引き継ぐ
+      （旧スキーマの id はスレッドIDなので、その場合だけ新しく採番させる）
+    - excluded は生成列なのでコピーしない
+    """
+    id_sql = "id, " if (code_col != "id" and "id" in _colnames(con, TABLE_ALL)) else ""
+
+    tmp = f"{TABLE_ALL}__new"
+    con.execute(f"DROP TABLE IF EXISTS {tmp};")
+    con.commit()
+
+    # 新スキーマ作成（tmp名）
+    con.executescript(
+        DDL_ITEMS_ALL.replace(
+            f"CREATE TABLE IF NOT EXISTS {TABLE_ALL}",
+            f"CREATE TABLE IF NOT EXISTS {tmp}"
+        )
+    )
+    con.commit()
+
+    con.execute(
+        f"""
+        INSERT INTO {tmp} (
+          {id_sql}code, check_date, first_seen_at, first_post, last_post,
+          comments_count, category, title, out_auto, out_manual
+        )
+        SELECT
+          {id_sql}{code_col} AS code,
+          check_date, first_seen_at, first_post, last_post,
+          comments_count, category, title,
+          COALESCE(out_auto,0), COALESCE(out_manual,0)
+        FROM {TABLE_ALL}
+        """
+    )
+    con.commit()
+
+    # 旧テーブルを入れ替え（旧トリガーはテーブルと一緒に消える）
+    con.execute(f"DROP TABLE {TABLE_ALL};")
+    con.execute(f"ALTER TABLE {tmp} RENAME TO {TABLE_ALL};")
+    con.commit()
+
+def _rebuild_without_rowid(con: sqlite3.Connection, table: str, ddl: str) -> None:
+    """
+    旧版（id INTEGER PRIMARY KEY + code UNIQUE）の do/done を WITHOUT ROWID 版へ作り直す
+    - MIGRATE_DO_DONE_WITHOUT_ROWID=False なら何もしない（v10 が id 版を使っている）
+    - 新DDLに無い列（id 以外）があるテーブルは、列が消えるので作り直さない
+    """
+    if not MIGRATE_DO_DONE_WITHOUT_ROWID:
+        return
+    if not _table_exists(con, table):
+        return
+    old_cols = _colnames(con, table)
+    if "id" not in old_cols:
+        return
+
+    tmp = f"{table}__new"
+    con.execute(f"DROP TABLE IF EXISTS {tmp};")
+    con.executescript(
+        ddl.replace(
+            f"CREATE TABLE IF NOT EXISTS {table} (",
+            f"CREATE TABLE IF NOT EXISTS {tmp} ("
+        )
+    )
+    new_cols = _colnames(con, tmp)
+    extra = [c for c in old_cols if c != "id" and c not in new_cols]
+    if extra:
+        con.execute(f"DROP TABLE {tmp};")
+        con.commit()
+        print(f"[WARN] {table}: 新DDLに無い列 {extra} があるため WITHOUT ROWID 版へ移行しません")
+        return
+
+    cols = [c for c in new_cols if c in old_cols]
+    col_sql = ", ".join(cols)
+    con.execute(f"INSERT INTO {tmp} ({col_sql}) SELECT {col_sql} FROM {table};")
+    con.execute(f"DROP TABLE {table};")
+    con.execute(f"ALTER TABLE {tmp} RENAME TO {table};")
+    con.commit()
+
 def ensure_schema(con: sqlite3.Connection) -> None:
     """
     1) items_all を最新スキーマで用意（必要なら旧スキーマから移行）
-    2) items_do / items_done を作成
-    3) excluded 同期トリガーを再作成
+    2) items_do / items_done を作成（MIGRATE_DO_DONE_WITHOUT_ROWID=True なら旧 id 版を WITHOUT ROWID 版へ移行）
+    3) 旧版の excluded 同期トリガーを削除（excluded は生成列になった）
+
+    user_version が SCHEMA_VERSION 以上なら適用済みとみなして何もしない。
+    （MIGRATE_DO_DONE_WITHOUT_ROWID=True のときは do/done の移行を確認するため毎回流す）
     """
+    if (
+        con.execute("PRAGMA user_version;").fetchone()[0] >= SCHEMA_VERSION
+        and not MIGRATE_DO_DONE_WITHOUT_ROWID
+    ):
+        return
+
     # --- 旧スキーマ判定（items_all） ---
     if _table_exists(con, TABLE_ALL):
         cols = _colnames(con, TABLE_ALL)
@@ -258,10 +413,6 @@ def ensure_schema(con: sqlite3.Connection) -> None:
                 con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN out_manual INTEGER NOT NULL DEFAULT 0;")
                 con.commit()
                 colset.add("out_manual")
-            if "excluded" not in colset:
-                con.execute(f"ALTER TABLE {TABLE_ALL} ADD COLUMN excluded INTEGER NOT NULL DEFAULT 0;")
-                con.commit()
-                colset.add("excluded")
 
             # first_seen_at が空なら check_date を入れておく
             con.execute(
@@ -273,128 +424,87 @@ def ensure_schema(con: sqlite3.Connection) -> None:
             )
             con.commit()
 
-            # excluded を out_auto/out_manual から再計算
-            con.execute(
-                f"""
-                UPDATE {TABLE_ALL}
-                   SET excluded = CASE WHEN COALESCE(out_auto,0)=1 OR COALESCE(out_manual,0)=1 THEN 1 ELSE 0 END
-                """
-            )
-            con.commit()
-
-            # --- 新テーブルにコピー ---
-            tmp = f"{TABLE_ALL}__new"
-            con.execute(f"DROP TABLE IF EXISTS {tmp};")
-            con.commit()
-
-            # 新スキーマ作成（tmp名）
-            con.executescript(
-                DDL_ITEMS_ALL.replace(
-                    f"CREATE TABLE IF NOT EXISTS {TABLE_ALL}",
-                    f"CREATE TABLE IF NOT EXISTS {tmp}"
-                )
-            )
-            con.commit()
-
             # 旧 id(TEXT) → 新 code(TEXT UNIQUE)
-            con.execute(
-                f"""
-                INSERT INTO {tmp} (
-                  code, check_date, first_seen_at, first_post, last_post,
-                  comments_count, category, title, out_auto, out_manual, excluded
-                )
-                SELECT
-                  id AS code,
-                  check_date, first_seen_at, first_post, last_post,
-                  comments_count, category, title,
-                  COALESCE(out_auto,0), COALESCE(out_manual,0), COALESCE(excluded,0)
-                FROM {TABLE_ALL}
-                """
-            )
-            con.commit()
+            _rebuild_items_all(con, "id")
 
-            # 旧テーブルを入れ替え
-            con.execute(f"DROP TABLE {TABLE_ALL};")
-            con.execute(f"ALTER TABLE {tmp} RENAME TO {TABLE_ALL};")
-            con.commit()
+        # 現行スキーマだが excluded が通常列（トリガー同期版）→ 生成列へ作り直し
+        elif not _excluded_is_generated(con):
+            _rebuild_items_all(con, "code")
+
+    # --- items_do / items_done（旧 id 版 → WITHOUT ROWID 版） ---
+    _rebuild_without_rowid(con, TABLE_DO, DDL_DO)
+    _rebuild_without_rowid(con, TABLE_DONE, DDL_DONE)
 
     # --- 最新DDLを適用（無ければ作る / index補完） ---
     con.executescript(DDL_ITEMS_ALL)
     con.executescript(DDL_DO_DONE)
-    con.commit()
+    for idx_name in OBSOLETE_INDEXES_ALL:
+        con.execute(f"DROP INDEX IF EXISTS {idx_name};")
 
-    # --- excluded 同期トリガー（items_all: code 版） ---
+    # --- 旧版の excluded 同期トリガー（生成列になったので不要） ---
     con.execute("DROP TRIGGER IF EXISTS trg_items_all_excluded_sync_ai;")
     con.execute("DROP TRIGGER IF EXISTS trg_items_all_excluded_sync_au;")
-
-    con.execute(
-        f"""
-        CREATE TRIGGER trg_items_all_excluded_sync_ai
-        AFTER INSERT ON {TABLE_ALL}
-        BEGIN
-          UPDATE {TABLE_ALL}
-             SET excluded = CASE WHEN NEW.out_auto=1 OR NEW.out_manual=1 THEN 1 ELSE 0 END
-           WHERE rowid = NEW.rowid;
-        END;
-        """
-    )
-    con.execute(
-        f"""
-        CREATE TRIGGER trg_items_all_excluded_sync_au
-        AFTER UPDATE OF out_auto, out_manual ON {TABLE_ALL}
-        BEGIN
-          UPDATE {TABLE_ALL}
-             SET excluded = CASE WHEN NEW.out_auto=1 OR NEW.out_manual=1 THEN 1 ELSE 0 END
-           WHERE rowid = NEW.rowid;
-        END;
-        """
-    )
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
     con.commit()
 
 def exists_code(con: sqlite3.Connection, code: str) -> bool:
     return con.execute(f"SELECT 1 FROM {TABLE_ALL} WHERE code=? LIMIT 1", (code,)).fetchone() is not None
 
+def load_existing_codes(con: sqlite3.Connection) -> Set[str]:
+    """
+    items_all の code を一括取得（一覧ループ内の exists_code 往復をなくす）
+    """
+    return {r[0] for r in con.execute(f"SELECT code FROM {TABLE_ALL};")}
+
+def load_excluded_map(con: sqlite3.Connection) -> Dict[str, int]:
+    """
+    code -> excluded を一括取得（STEP2 の get_excluded 往復をなくす）
+    """
+    return {r[0]: int(r[1] or 0) for r in con.execute(f"SELECT code, excluded FROM {TABLE_ALL};")}
+
 def get_excluded(con: sqlite3.Connection, code: str) -> int:
     row = con.execute(f"SELECT excluded FROM {TABLE_ALL} WHERE code=? LIMIT 1", (code,)).fetchone()
     if not row:
         return 0
     return int(row[0] or 0)
 
-def set_first_post(con: sqlite3.Connection, code: str, first_post: str) -> None:
-    con.execute(
-        f"""
-        UPDATE {TABLE_ALL}
-           SET first_post = COALESCE(first_post, ?)
-         WHERE code=?;
-        """,
-        (first_post, code),
-    )
+_SET_FIRST_POST_SQL = f"""
+UPDATE {TABLE_ALL}
+   SET first_post = COALESCE(first_post, ?)
+ WHERE code=?;
+"""
 
-def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
+def set_first_posts(con: sqlite3.Connection, updates: List[Tuple[str, str]]) -> None:
     """
-    - first_seen_at は初回INSERTで入れる / 以後保持（NULLのときだけ埋める）
-    - first_post も同様に “NULLのときだけ埋める”（後段で入れる）
-    - last_post は毎回更新
-    - out_manual は手動なのでUPSERT更新で触らない（=消さない）
-    - excluded はトリガーで out_auto/out_manual から自動同期
+    updates: [(first_post, code), ...] をまとめて反映（first_post が空の行だけ埋める）
     """
-    sql = f"""
-    INSERT INTO {TABLE_ALL} (
-        code, check_date, first_seen_at, first_post, last_post,
-        comments_count, category, title, out_auto
-    )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(code) DO UPDATE SET
-      check_date=excluded.check_date,
-      first_seen_at=COALESCE({TABLE_ALL}.first_seen_at, excluded.first_seen_at),
-      first_post=COALESCE({TABLE_ALL}.first_post, excluded.first_post),
-      last_post=excluded.last_post,
-      comments_count=excluded.comments_count,
-      category=excluded.category,
-      title=excluded.title,
-      out_auto=excluded.out_auto
-    """
-    con.execute(sql, (
+    con.executemany(_SET_FIRST_POST_SQL, updates)
+
+# UPSERT（ページ単位で executemany する）
+#  - first_seen_at は初回INSERTで入れる / 以後保持（NULLのときだけ埋める）
+#  - first_post も同様に “NULLのときだけ埋める”（後段で入れる）
+#  - last_post は毎回更新
+#  - out_manual は手動なのでUPSERT更新で触らない（=消さない）
+#  - excluded は生成列なので out_auto/out_manual から自動で決まる
+_UPSERT_SQL = f"""
+INSERT INTO {TABLE_ALL} (
+    code, check_date, first_seen_at, first_post, last_post,
+    comments_count, category, title, out_auto
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(code) DO UPDATE SET
+  check_date=excluded.check_date,
+  first_seen_at=COALESCE({TABLE_ALL}.first_seen_at, excluded.first_seen_at),
+  first_post=COALESCE({TABLE_ALL}.first_post, excluded.first_post),
+  last_post=excluded.last_post,
+  comments_count=excluded.comments_count,
+  category=excluded.category,
+  title=excluded.title,
+  out_auto=excluded.out_auto
+"""
+
+def _row_to_tuple(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
         row["code"],
         row["check_date"],
         row["first_seen_at"],
@@ -404,16 +514,44 @@ def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
         row["category"],
         row["title"],
         int(row["out_auto"]),
-    ))
+    )
 
 # =========================================================
 # items_do 同期（items_all -> items_do）
 #   - excluded=1 は items_do から削除（履歴残さない）
 #   - created_at/updated_at は無いので title だけ追随させる
 # =========================================================
+_SYNC_DO_UPSERT_SQL = f"""
+INSERT INTO {TABLE_DO} (code, title, status, step)
+SELECT a.code, a.title, 'queued', 0
+  FROM {TABLE_ALL} a
+ WHERE a.excluded = 0
+ON CONFLICT(code) DO UPDATE SET
+  title=excluded.title
+"""
+
+_SYNC_DO_DELETE_EXCLUDED_SQL = f"""
+DELETE FROM {TABLE_DO}
+ WHERE EXISTS (
+   SELECT 1 FROM {TABLE_ALL} a
+    WHERE a.code = {TABLE_DO}.code AND a.excluded = 1
+ )
+"""
+
+_SYNC_DO_DELETE_MISSING_SQL = f"""
+DELETE FROM {TABLE_DO}
+ WHERE NOT EXISTS (
+   SELECT 1 FROM {TABLE_ALL} a
+    WHERE a.code = {TABLE_DO}.code
+ )
+"""
+
+_COUNT_DO_SQL = f"SELECT COUNT(*) FROM {TABLE_DO};"
+
 def sync_items_do_from_all(con: sqlite3.Connection) -> None:
     """
     items_all が更新されたら items_do も同期する。
+    3文（追加/同期・excluded削除・消えたcode削除）は1トランザクションで実行する。
 
     仕様:
     - items_all.excluded=0 の code/title を items_do へ投入
@@ -421,53 +559,58 @@ def sync_items_do_from_all(con: sqlite3.Connection) -> None:
     - items_all.excluded=1 は items_do から削除
     - items_all から消えた code も items_do から削除
     """
+    # 呼び出し側の未コミット分を確定してから、同期用の書き込みトランザクションを開始
+    if con.in_transaction:
+        con.commit()
+    con.execute("BEGIN IMMEDIATE;")
+
+    # 件数は各文の cursor.rowcount（= sqlite3_changes）で取る
     # 1) excluded=0 を追加/同期（status/stepは上書きしない）
-    con.execute(
-        f"""
-        INSERT INTO {TABLE_DO} (code, title, status, step)
-        SELECT a.code, a.title, 'queued', 0
-          FROM {TABLE_ALL} a
-         WHERE a.excluded = 0
-        ON CONFLICT(code) DO UPDATE SET
-          title=excluded.title
-        """
-    )
-    upsert_changes = con.execute("SELECT changes();").fetchone()[0]
+    upsert_changes = con.execute(_SYNC_DO_UPSERT_SQL).rowcount
 
     # 2) excluded=1 は削除
-    con.execute(
-        f"""
-        DELETE FROM {TABLE_DO}
-         WHERE code IN (SELECT code FROM {TABLE_ALL} WHERE excluded=1)
-        """
-    )
-    deleted_excluded = con.execute("SELECT changes();").fetchone()[0]
+    deleted_excluded = con.execute(_SYNC_DO_DELETE_EXCLUDED_SQL).rowcount
 
     # 3) items_all から消えた code も削除
-    con.execute(
-        f"""
-        DELETE FROM {TABLE_DO}
-         WHERE code NOT IN (SELECT code FROM {TABLE_ALL})
-        """
-    )
-    deleted_missing = con.execute("SELECT changes();").fetchone()[0]
+    deleted_missing = con.execute(_SYNC_DO_DELETE_MISSING_SQL).rowcount
 
     con.commit()
 
-    total_do = con.execute(f"SELECT COUNT(*) FROM {TABLE_DO};").fetchone()[0]
+    total_do = con.execute(_COUNT_DO_SQL).fetchone()[0]
     print(f"[SYNC] {TABLE_DO}: upsert_changes={upsert_changes} deleted_excluded={deleted_excluded} deleted_missing={deleted_missing} total={total_do}")
 
 # =========================================================
 # 変換/判定
 # =========================================================
-def digits_only_int(s: str) -> int:
+_COUNT_SEP_STRIP = str.maketrans("", "", ", \u3000")
+
+def _digits_only_int_slow(s: str) -> int:
     nums = re.findall(r"\d+", (s or "").replace(",", ""))
     return int("".join(nums)) if nums else 0
 
+@lru_cache(maxsize=1024)
+def digits_only_int(s: str) -> int:
+    # 通常は "1,234" のような数字+区切りだけなので、区切りを消して int() で済ませる
+    t = (s or "").translate(_COUNT_SEP_STRIP)
+    if t.isdecimal():
+        return int(t)
+    return _digits_only_int_slow(s)
+
 def normalize_list_datetime(raw: str) -> str:
     txt = (raw or "").strip()
     if not txt:
         return "1970-01-01 00:00:00"
+
+    # 既知の書式は正規表現で直接組み立てる（dateutil の fuzzy 解析は遅い）
+    m = RE_LIST_DT.search(txt)
+    if m:
+        y, mo, d, hh, mi, ss = m.groups()
+        try:
+            dt = datetime(int(y), int(mo), int(d), int(hh), int(mi), int(ss or 0))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
     try:
         dt = dtparser.parse(txt, fuzzy=True)
         return dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -482,16 +625,59 @@ def parse_first_post_from_text(body_text: str) -> str | None:
     y, mo, d, hh, mm, ss = m.groups()
     return f"{y}-{mo}-{d} {hh}:{mm}:{ss}"
 
+# body.inner_text() 相当のテキストにするときの扱い
+#  - 中身を捨てる要素（script 等）/ 前後で改行する要素（それ以外のインライン要素は改行しない）
+_HTML_SKIP_TAGS = frozenset({"head", "script", "style", "noscript", "template", "svg"})
+_HTML_BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+})
+
+_RE_HTML_WS = re.compile(r"\s+")
+
+class _BodyTextParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in _HTML_SKIP_TAGS:
+            self._skip += 1
+        elif tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        if tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag) -> None:
+        if tag in _HTML_SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _HTML_BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data) -> None:
+        if not self._skip:
+            self.parts.append(_RE_HTML_WS.sub(" ", data))
+
+def html_to_text(html: str) -> str:
+    """
+    HTML からタグ・属性・script/style を除いた表示テキストを作る（body.inner_text() の近似）
+    - 行内の空白は詰め、ブロック要素の境目だけ改行にする
+    """
+    parser = _BodyTextParser()
+    try:
+        parser.feed(html or "")
+        parser.close()
+    except Exception:
+        pass
+    return "".join(parser.parts)
+
+@lru_cache(maxsize=4096)
 def should_out_auto(title: str) -> int:
-    t = (title or "")
-    if "PART" in t.upper():
-        return 1
-    for w in OUT_AUTO_WORDS:
-        if w in ("Part", "PART"):
-            continue
-        if w and (w in t):
-            return 1
-    return 0
+    return 1 if RE_OUT_AUTO.search(title or "") else 0
 
 def build_page_url(cfg: CategoryConfig, page_no: int) -> str:
     return f"{cfg.base_url}/{page_no}/" + (cfg.params or "")
@@ -511,41 +697,125 @@ def short(s: str, n: int = 70) -> str:
 
 # =========================================================
 # first_post 取得（高速版：comment/1 を参照）
+#  - ページは開かず APIRequestContext（p.request）で HTML だけ取る（ブラウザ起動/DOM構築/JS実行なし）
+#  - DETAIL_CONCURRENCY 本のワーカーで並列に回す
 # =========================================================
-def fetch_first_post_via_comment1(detail_page, thread_code: str) -> str | None:
+async def fetch_first_post_via_comment1(api, thread_code: str) -> str | None:
     url = f"https://girlschannel.net/comment/{thread_code}/1/"
     try:
-        resp = detail_page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_FIRSTPOST_GOTO)
-        status = resp.status if resp else None
-        if not resp or (status and status >= 400):
+        resp = await api.get(url, timeout=TIMEOUT_MS_FIRSTPOST_GOTO)
+        if not resp.ok:
             return None
-    except PWTimeoutError:
-        return None
-
-    try:
-        body_txt = detail_page.locator("body").inner_text(timeout=TIMEOUT_MS_FIRSTPOST_TEXT)
+        html = await resp.text()
     except PWTimeoutError:
         return None
     except Exception:
         return None
 
-    return parse_first_post_from_text(body_txt)
+    # body.inner_text() 相当にするため、タグ/属性/script を落としたテキストから拾う
+    return parse_first_post_from_text(html_to_text(html))
+
+async def fetch_first_posts(codes: List[str]) -> Dict[str, str | None]:
+    """
+    codes の first_post をまとめて取得する（code -> first_post / 取れなければ None）
+    """
+    results: Dict[str, str | None] = {}
+    if not codes:
+        return results
+
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for code in codes:
+        queue.put_nowait(code)
+
+    async def _worker(api) -> None:
+        while True:
+            try:
+                code = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            results[code] = await fetch_first_post_via_comment1(api, code)
+
+            done = len(results)
+            if (done % 50) == 0:
+                filled = sum(1 for v in results.values() if v)
+                print(f"[STEP2] progress {done}/{len(codes)} filled={filled} failed={done - filled}")
+
+            if DETAIL_SLEEP_SEC > 0:
+                await asyncio.sleep(DETAIL_SLEEP_SEC)
+
+    async with async_playwright() as p:
+        # ブラウザは起動せず APIRequestContext だけで素の HTTP を投げる
+        #  （comment/1 はログイン不要なので一覧側の Cookie は引き継がない）
+        api = await p.request.new_context(
+            extra_http_headers={"Accept-Language": "ja-JP,ja;q=0.9"},
+        )
+        try:
+            workers = max(1, min(DETAIL_CONCURRENCY, len(codes)))
+            await asyncio.gather(*(_worker(api) for _ in range(workers)))
+        finally:
+            await api.dispose()
+
+    return results
+
+# =========================================================
+# 一覧ページの抽出（page.evaluate 1回で全 li を取る）
+#  - XPath は従来の locator と同じもの（li ごとの往復をなくす）
+# =========================================================
+JS_LIST_ROWS = """
+() => {
+  const first = (xp, ctx) => document.evaluate(
+    xp, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+  ).singleNodeValue;
+  const text = (xp, ctx) => {
+    const n = first(xp, ctx);
+    return n ? n.innerText : null;
+  };
+  const snap = document.evaluate(
+    "/html/body/div[1]/div[1]/div[1]/ul[2]/li", document, null,
+    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+  );
+  const rows = [];
+  for (let i = 0; i < snap.snapshotLength; i++) {
+    const li = snap.snapshotItem(i);
+    const a = first("./a", li);
+    rows.push({
+      href: a ? (a.getAttribute("href") || "") : "",
+      comments: text("./a/div/p/span[2]", li),
+      last: text("./a/div/p/span[3]", li),
+      title: text("./a/p", li),
+    });
+  }
+  return rows;
+}
+"""
 
 # =========================================================
 # Playwright高速化：リクエストブロック
 # =========================================================
-def install_request_blocking(page) -> None:
+BLOCK_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")
+
+def _should_block(request, block_script: bool) -> bool:
+    rtype = request.resource_type
+    if rtype in BLOCK_RESOURCE_TYPES:
+        return True
+    if block_script and rtype == "script":
+        return True
+    return RE_BLOCK_HOST.search(request.url) is not None
+
+def install_request_blocking(context, block_script: bool = False) -> None:
+    """
+    context 単位で1回だけ route を張る（配下の全ページに効く）
+    """
     if not REQUEST_BLOCK:
         return
 
     def _route_handler(route, request):
-        rtype = request.resource_type
-        if rtype in ("image", "media", "font", "stylesheet"):
+        if _should_block(request, block_script):
             return route.abort()
         return route.continue_()
 
     try:
-        page.route("**/*", _route_handler)
+        context.route("**/*", _route_handler)
     except Exception:
         pass
 
@@ -600,190 +870,206 @@ def main() -> int:
     print(f"[INFO] update_existing: {UPDATE_EXISTING}")
     print(f"[INFO] enabled_categories: {', '.join([c.name for c in enabled_categories])}")
     print(f"[INFO] first_post: comment/1 から取得（excluded=1はスキップ）")
-    print(f"[INFO] request_block: {REQUEST_BLOCK}")
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        context = browser.new_context(locale="ja-JP")
+    print(f"[INFO] request_block: {REQUEST_BLOCK} (list_script={BLOCK_SCRIPT_ON_LIST})")
 
-        page = context.new_page()
-        detail_page = context.new_page()
-
-        install_request_blocking(page)
-        install_request_blocking(detail_page)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=HEADLESS)
+            context = browser.new_context(locale="ja-JP")
+            install_request_blocking(context, block_script=BLOCK_SCRIPT_ON_LIST)
 
-        try:
-            pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved")
+            page = context.new_page()
 
-            # STEP 1) 一覧取得 → items_all へ保存
-            for cfg in enabled_categories:
-                if saved >= TARGET_NEW_COUNT:
-                    break
+            try:
+                pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved")
 
-                print(f"\n[CATEGORY] {cfg.name}  base={cfg.base_url}  params={cfg.params}")
-                consecutive_no_save_pages = 0
+                # 既存 code は最初に一括で読み込み、以後はメモリ上で判定する
+                existing_codes = load_existing_codes(con)
 
-                for page_no in range(PAGE_FROM, PAGE_TO + 1):
+                # STEP 1) 一覧取得 → items_all へ保存
+                for cfg in enabled_categories:
                     if saved >= TARGET_NEW_COUNT:
                         break
 
-                    url = build_page_url(cfg, page_no)
+                    print(f"\n[CATEGORY] {cfg.name}  base={cfg.base_url}  params={cfg.params}")
+                    consecutive_no_save_pages = 0
 
-                    try:
-                        resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_LIST)
-                        status = resp.status if resp else None
-                        if (not resp) or (status and status >= 400):
-                            failed_page += 1
-                            print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
-                            time.sleep(SLEEP_SEC)
-                            continue
-                    except PWTimeoutError:
-                        failed_page += 1
-                        print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
-                        time.sleep(SLEEP_SEC)
-                        continue
-
-                    li_locator = page.locator("xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li")
-                    li_count = li_locator.count()
-                    if li_count == 0:
-                        print(f"[NO_ITEMS] cat={cfg.name} page={page_no} url={url}")
-                        break
-
-                    page_rows: List[Tuple[int, Dict[str, Any], bool]] = []
-
-                    for idx in range(1, li_count + 1):
-                        seen += 1
+                    for page_no in range(PAGE_FROM, PAGE_TO + 1):
+                        if saved >= TARGET_NEW_COUNT:
+                            break
 
-                        a = page.locator(
-                            f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a"
-                        ).first
-                        href = a.get_attribute("href") or ""
-                        m = RE_TOPIC_HREF.search(href)
-                        if not m:
-                            failed_item += 1
-                            continue
-                        code = m.group(1)
+                        url = build_page_url(cfg, page_no)
 
                         try:
-                            comments_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[2]"
-                            ).first.inner_text(timeout=5000).strip()
-                            last_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[3]"
-                            ).first.inner_text(timeout=5000).strip()
-                            title = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/p"
-                            ).first.inner_text(timeout=5000).strip()
+                            resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS_LIST)
+                            status = resp.status if resp else None
+                            if (not resp) or (status and status >= 400):
+                                failed_page += 1
+                                print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
+                                time.sleep(SLEEP_SEC)
+                                continue
                         except PWTimeoutError:
-                            failed_item += 1
-                            continue
-
-                        comments_count = digits_only_int(comments_raw)
-                        if comments_count < MIN_COMMENTS:
-                            skipped_under_min += 1
+                            failed_page += 1
+                            print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
+                            time.sleep(SLEEP_SEC)
                             continue
 
-                        already = exists_code(con, code)
-                        if (not UPDATE_EXISTING) and already:
+                        try:
+                            li_rows = page.evaluate(JS_LIST_ROWS)
+                        except Exception as e:
+                            failed_page += 1
+                            print(f"[PAGE_EVAL_FAIL] cat={cfg.name} page={page_no} url={url} err={e}")
+                            time.sleep(SLEEP_SEC)
                             continue
-
-                        last_post = normalize_list_datetime(last_raw)
-                        out_auto = should_out_auto(title)
-
-                        row: Dict[str, Any] = {
-                            "code": code,
-                            "check_date": run_dt,
-                            "first_seen_at": run_dt,
-                            "first_post": None,
-                            "last_post": last_post,
-                            "comments_count": comments_count,
-                            "category": cfg.name,
-                            "title": title,
-                            "out_auto": out_auto,
-                        }
-                        page_rows.append((idx, row, already))
-
-                    page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["last_post"])))
-
-                    page_saved = 0
-                    for orig_idx, row, already in page_rows:
-                        if saved >= TARGET_NEW_COUNT:
+                        if not li_rows:
+                            print(f"[NO_ITEMS] cat={cfg.name} page={page_no} url={url}")
                             break
 
-                        upsert(con, row)
-                        con.commit()
-
-                        saved += 1
-                        page_saved += 1
-                        pbar.update(1)
-
-                        if row["out_auto"] == 1:
-                            out_auto_ones += 1
-
-                        if already:
-                            updated += 1
-                        else:
-                            new_inserts += 1
-                            newly_inserted_codes.append(row["code"])
-
-                        if ECHO_EACH_SAVE:
+                        page_rows: List[Tuple[int, Dict[str, Any], bool]] = []
+
+                        for idx, li in enumerate(li_rows, start=1):
+                            seen += 1
+
+                            m = RE_TOPIC_HREF.search(li.get("href") or "")
+                            if not m:
+                                failed_item += 1
+                                continue
+                            code = m.group(1)
+
+                            comments_raw = li.get("comments")
+                            last_raw = li.get("last")
+                            title = li.get("title")
+                            if comments_raw is None or last_raw is None or title is None:
+                                failed_item += 1
+                                continue
+                            comments_raw = comments_raw.strip()
+                            last_raw = last_raw.strip()
+                            title = title.strip()
+
+                            comments_count = digits_only_int(comments_raw)
+                            if comments_count < MIN_COMMENTS:
+                                skipped_under_min += 1
+                                continue
+
+                            already = code in existing_codes
+                            if (not UPDATE_EXISTING) and already:
+                                continue
+
+                            last_post = normalize_list_datetime(last_raw)
+                            out_auto = should_out_auto(title)
+
+                            row: Dict[str, Any] = {
+                                "code": code,
+                                "check_date": run_dt,
+                                "first_seen_at": run_dt,
+                                "first_post": None,
+                                "last_post": last_post,
+                                "comments_count": comments_count,
+                                "category": cfg.name,
+                                "title": title,
+                                "out_auto": out_auto,
+                            }
+                            page_rows.append((idx, row, already))
+
+                        page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["last_post"])))
+
+                        # ページ内の保存は executemany 1回 + commit 1回にまとめる
+                        page_saved = 0
+                        batch: List[Tuple[Any, ...]] = []
+                        for orig_idx, row, already in page_rows:
+                            if saved >= TARGET_NEW_COUNT:
+                                break
+
+                            batch.append(_row_to_tuple(row))
+                            existing_codes.add(row["code"])
+
+                            saved += 1
+                            page_saved += 1
+                            pbar.update(1)
+
+                            if row["out_auto"] == 1:
+                                out_auto_ones += 1
+
+                            if already:
+                                updated += 1
+                            else:
+                                new_inserts += 1
+                                newly_inserted_codes.append(row["code"])
+
+                            if ECHO_EACH_SAVE:
+                                print(
+                                    f"[OK] cat={cfg.name} page={page_no} li={orig_idx} saved={saved} code={row['code']} "
+                                    f"last={row['last_post']} c={row['comments_count']} out_auto={row['out_auto']} "
+                                    f"new={'1' if not already else '0'} "
+                                    f"title={short(row['title'],60)}"
+                                )
+
+                        if batch:
+                            con.executemany(_UPSERT_SQL, batch)
+                            con.commit()
+
+                        if page_saved == 0:
+                            consecutive_no_save_pages += 1
                             print(
-                                f"[OK] cat={cfg.name} page={page_no} li={orig_idx} saved={saved} code={row['code']} "
-                                f"last={row['last_post']} c={row['comments_count']} out_auto={row['out_auto']} "
-                                f"new={'1' if not already else '0'} "
-                                f"title={short(row['title'],60)}"
+                                f"[NO_SAVE] cat={cfg.name} page={page_no} consecutive={consecutive_no_save_pages} "
+                                f"(under_min_total={skipped_under_min}, failed_total={failed_item})"
                             )
+                            if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
+                                print("[EARLY_STOP] no saved items for consecutive pages (this category) -> stop this category")
+                                break
+                        else:
+                            consecutive_no_save_pages = 0
 
-                    if page_saved == 0:
-                        consecutive_no_save_pages += 1
-                        print(
-                            f"[NO_SAVE] cat={cfg.name} page={page_no} consecutive={consecutive_no_save_pages} "
-                            f"(under_min_total={skipped_under_min}, failed_total={failed_item})"
-                        )
-                        if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
-                            print("[EARLY_STOP] no saved items for consecutive pages (this category) -> stop this category")
-                            break
-                    else:
-                        consecutive_no_save_pages = 0
+                        time.sleep(SLEEP_SEC)
+
+                pbar.close()
 
-                    time.sleep(SLEEP_SEC)
+            finally:
+                context.close()
+                browser.close()
 
-            pbar.close()
+        # STEP 2) 新規 & excluded=0 のみ first_post を埋める
+        if newly_inserted_codes:
+            print("\n[STEP2] fetch first_post for newly inserted & excluded=0 (via comment/1)")
+            print(f"[STEP2] newly_inserted_codes={len(newly_inserted_codes)} concurrency={DETAIL_CONCURRENCY}")
+        else:
+            print("\n[STEP2] no newly inserted codes -> skip first_post fetching")
 
-            # STEP 2) 新規 & excluded=0 のみ first_post を埋める
-            if newly_inserted_codes:
-                print("\n[STEP2] fetch first_post for newly inserted & excluded=0 (via comment/1)")
-                print(f"[STEP2] newly_inserted_codes={len(newly_inserted_codes)}")
+        excluded_map = load_excluded_map(con) if newly_inserted_codes else {}
+
+        targets: List[str] = []
+        for code in newly_inserted_codes:
+            if excluded_map.get(code, 0) == 1:
+                first_post_skipped_excluded += 1
             else:
-                print("\n[STEP2] no newly inserted codes -> skip first_post fetching")
+                targets.append(code)
 
-            for i, code in enumerate(newly_inserted_codes, start=1):
-                if get_excluded(con, code) == 1:
-                    first_post_skipped_excluded += 1
-                    continue
+        first_posts = asyncio.run(fetch_first_posts(targets)) if targets else {}
 
-                fp = fetch_first_post_via_comment1(detail_page, code)
-                if fp:
-                    set_first_post(con, code, fp)
-                    con.commit()
-                    first_post_filled += 1
-                else:
-                    first_post_failed += 1
+        fp_updates: List[Tuple[str, str]] = []
+        for code in targets:
+            fp = first_posts.get(code)
+            if fp:
+                fp_updates.append((fp, code))
+                first_post_filled += 1
+            else:
+                first_post_failed += 1
 
-                if (i % 50) == 0:
-                    print(f"[STEP2] progress {i}/{len(newly_inserted_codes)} filled={first_post_filled} failed={first_post_failed} skipped_excl={first_post_skipped_excluded}")
+            if len(fp_updates) >= FIRST_POST_WRITE_BATCH:
+                set_first_posts(con, fp_updates)
+                con.commit()
+                fp_updates.clear()
 
-                if DETAIL_SLEEP_SEC > 0:
-                    time.sleep(DETAIL_SLEEP_SEC)
+        if fp_updates:
+            set_first_posts(con, fp_updates)
+            con.commit()
 
-            # STEP 3) items_all -> items_do 同期（excluded=0 の code/title 抽出）
-            print("\n[STEP3] sync items_do from items_all (excluded=0)")
-            sync_items_do_from_all(con)
+        # STEP 3) items_all -> items_do 同期（excluded=0 の code/title 抽出）
+        print("\n[STEP3] sync items_do from items_all (excluded=0)")
+        sync_items_do_from_all(con)
 
-        finally:
-            con.close()
-            context.close()
-            browser.close()
+    finally:
+        con.close()
 
     print("\n[SUMMARY]")
     print(f"  saved={saved} target={TARGET_NEW_COUNT}")
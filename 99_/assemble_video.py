@@ -63,7 +63,7 @@ if not BASE_OUTPUT_ROOT:
 
 # --- 共通：SQLite運用（01/02と合わせる） ---
 BUSY_TIMEOUT_MS = CFG.BUSY_TIMEOUT_MS
-SQLITE_JOURNAL_MODE = (CFG.SQLITE_JOURNAL_MODE or "WAL").strip()
+SQLITE_JOURNAL_MODE = CFG.SQLITE_JOURNAL_MODE  # config で SQLITE_WAL も見て決めた値
 SQLITE_SYNCHRONOUS = (CFG.SQLITE_SYNCHRONOUS or "NORMAL").strip()
 
 # --- 共通：DBロック運用 ---
@@ -4,8 +4,10 @@
 from __future__ import annotations
 import re
 import time
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Set
 import sqlite3
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -40,6 +42,7 @@ UPDATE_EXISTING = False          # ★既存IDも更新するならTrue（基本
 HEADLESS = True
 SLEEP_SEC = 0.6
 TIMEOUT_MS = 30000
+BLOCK_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")  # ★一覧はテキストしか読まないので取得しない（空で無効）
 
 ECHO_EACH_SAVE = True            # 保存ごとにターミナル表示
 EARLY_STOP_PAGES = 2             # 保存0件ページが連続したら終了（0で無効）
@@ -51,6 +54,8 @@ ENABLE_POST_TITLE = True
 ENABLE_TAG_LEARNING_COLUMNS = True
 # =========================================================
 
+JST = ZoneInfo("Asia/Tokyo")
+
 DDL = """
 CREATE TABLE IF NOT EXISTS items (
   id TEXT PRIMARY KEY,
@@ -66,28 +71,75 @@ CREATE TABLE IF NOT EXISTS items (
   keywords_drop TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_items_post_date ON items(post_date);
 CREATE INDEX IF NOT EXISTS idx_items_check_date ON items(check_date);
-CREATE INDEX IF NOT EXISTS idx_items_comments ON items(comments_count);
 CREATE INDEX IF NOT EXISTS idx_items_check_create ON items(check_create);
 
 -- ★ソート用（コメント数: 多い順 / post_date: 古い順）
 -- SQLiteは ASC/DESC 付きインデックスをサポートします。
+-- comments_count 単独の検索もこの複合インデックスで足りるので、単独インデックスは作らない。
 CREATE INDEX IF NOT EXISTS idx_items_sort_cc_desc_pd_asc
   ON items(comments_count DESC, post_date ASC);
 """
 
+# check_create / keywords_* は UPDATE 側に入れない（upsert_many の注意を参照）
+UPSERT_SQL = """
+INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+  check_date=excluded.check_date,
+  post_date=excluded.post_date,
+  comments_count=excluded.comments_count,
+  category=excluded.category,
+  title=excluded.title,
+  post_title=excluded.post_title
+"""
+
+# ★UPDATE_EXISTING=False 用：既存IDには触らず、実際に入った id だけ返す（確認と INSERT の間に入った行も上書きしない）
+INSERT_NEW_SQL = """
+INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO NOTHING
+RETURNING id
+"""
+
 RE_TOPIC_HREF = re.compile(r"/topics/(\d+)/")
+# 一覧の日時（例: 2024/01/07 19:20 / 01/07 19:20 / 2024/01/07(日) 19:20:05）。外れたら dateutil に回す
+RE_LIST_DT = re.compile(
+    r"^\s*(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})(?:\s*\([^)]*\))?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$"
+)
+
+# build_post_title 用（毎回 re.sub に文字列を渡さず、コンパイル済みを使う）
+# 【】を消すと前後がくっついて \b などの判定が変わるので、【】だけは先に別パスで消す
+RE_PT_BRACKET = re.compile(r"【[^】]{1,30}】")
+# PART n / #n / 第n回・弾 は1パスでまとめて消す
+RE_PT_NUMBERING = re.compile(r"\b(?:PART|Part|part)\s*\d+\b|[#＃]\s*\d+\b|第\s*\d+\s*(?:回|弾)")
+# 末尾アンカーは上を消した後の末尾で判定するので最後に別パス
+RE_PT_PART_TAIL = re.compile(r"(?:パート|Part|PART)\s*\d+\s*$")
+RE_PT_WS = re.compile(r"\s{2,}")
 
 def connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(str(db_path), timeout=30)
-    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute(f"PRAGMA journal_mode={CFG.SQLITE_JOURNAL_MODE};")  # 他のスクリプトと同じ値（既定 WAL）
     con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA mmap_size=268435456;")  # 256MB
+    con.execute("PRAGMA cache_size=-65536;")    # 約64MB（既定の約2MBだとインデックスが多く足りない）
+    con.execute("PRAGMA wal_autocheckpoint=1000;")
+    con.execute("PRAGMA busy_timeout=60000;")
     con.executescript(DDL)
     con.commit()
     return con
 
+def connect_ro(db_path: Path) -> sqlite3.Connection:
+    """
+    既存チェック（SELECT）専用の読み取り接続。
+    WAL なので書き込み接続の COMMIT 済みデータが読める。書き込みとは文キャッシュも分かれる。
+    """
+    con = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+    con.execute("PRAGMA query_only=1;")
+    return con
+
 def ensure_columns(con: sqlite3.Connection) -> None:
     """
     既存DBにも安全に追記できるように、カラムが無ければALTERで追加。
@@ -112,30 +164,52 @@ def ensure_columns(con: sqlite3.Connection) -> None:
             if name not in cols:
                 con.execute(f"ALTER TABLE items ADD COLUMN {name} TEXT;")
 
+    # ★旧DDLの単独インデックスを削除（UPSERT ごとの B-tree 更新を減らす）
+    # comments_count は複合インデックスの先頭キー、post_date は下流が check_create で絞ってから並べるだけ
+    dropped = False
+    for name in ("idx_items_comments", "idx_items_post_date"):
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone():
+            con.execute(f"DROP INDEX {name};")
+            dropped = True
+    if dropped:
+        con.execute("ANALYZE;")
+
     con.commit()
 
-def exists_id(con: sqlite3.Connection, tid: str) -> bool:
-    return con.execute("SELECT 1 FROM items WHERE id=? LIMIT 1", (tid,)).fetchone() is not None
+# 一覧ページの li をまとめて読む（li ごと・項目ごとに locator で往復しない）
+# ★従来の XPath（/html/body/div[1]/div[1]/div[1]/ul[2]/li, ./a/div/p/span[2] ...）と同じ位置を CSS で引く
+#   XPath の div[1] / span[2] は「同名要素の何番目か」なので :nth-of-type で対応させる
+#   querySelectorAll はブラウザ側のネイティブ実装で、li ごとに root から辿り直さない
+# 取れなかった項目は null で返す
+JS_LIST_ROWS = """
+() => {
+  const text = (li, sel) => {
+    const n = li.querySelector(sel);
+    return n ? n.innerText : null;
+  };
+  const lis = document.querySelectorAll(
+    ":root > body > div:nth-of-type(1) > div:nth-of-type(1) > div:nth-of-type(1) > ul:nth-of-type(2) > li"
+  );
+  const out = [];
+  for (const li of lis) {
+    const a = li.querySelector(":scope > a");
+    out.push({
+      href: a ? (a.getAttribute("href") || "") : "",
+      c: text(li, ":scope > a > div > p > span:nth-of-type(2)"),
+      post: text(li, ":scope > a > div > p > span:nth-of-type(3)"),
+      title: text(li, ":scope > a > p"),
+    });
+  }
+  return out;
+}
+"""
 
-def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    """
-    注意:
-    - check_create は “新規INSERT時のみ” row側（基本0）を入れる
-    - 既存UPDATE時は check_create を上書きしない（別スクリプトの判定に使うため）
-    - keywords_* もこのスクリプトでは触らない（別スクリプト担当）
-    """
-    sql = """
-    INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(id) DO UPDATE SET
-      check_date=excluded.check_date,
-      post_date=excluded.post_date,
-      comments_count=excluded.comments_count,
-      category=excluded.category,
-      title=excluded.title,
-      post_title=excluded.post_title
-    """
-    con.execute(sql, (
+def load_known_ids(con: sqlite3.Connection) -> Set[str]:
+    """items の id を全件読む（既存判定は実行中ずっとメモリ上の set で行い、ページごとに SELECT しない）。"""
+    return {r[0] for r in con.execute("SELECT id FROM items")}
+
+def upsert_params(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
         row["id"],
         int(row.get("check_create", 0)),
         row["check_date"],
@@ -144,37 +218,92 @@ def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
         row["category"],
         row["title"],
         row.get("post_title"),
-    ))
+    )
+
+def upsert_many(con: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    """
+    1ページ分をまとめて UPSERT して1回だけ COMMIT する（行ごとの COMMIT = fsync をやめる）。
+
+    注意:
+    - check_create は “新規INSERT時のみ” row側（基本0）を入れる
+    - 既存UPDATE時は check_create を上書きしない（別スクリプトの判定に使うため）
+    - keywords_* もこのスクリプトでは触らない（別スクリプト担当）
+    """
+    if not rows:
+        return
+    with con:
+        con.executemany(UPSERT_SQL, [upsert_params(r) for r in rows])
+
+def insert_new_many(con: sqlite3.Connection, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    1ページ分を新規だけ INSERT（既存は DO NOTHING）して1回だけ COMMIT し、実際に入った id を返す。
+    executemany では RETURNING の結果が取れないので、1トランザクションの中で1行ずつ実行する。
+    """
+    inserted: Set[str] = set()
+    if not rows:
+        return inserted
+    with con:
+        for r in rows:
+            hit = con.execute(INSERT_NEW_SQL, upsert_params(r)).fetchone()
+            if hit is not None:
+                inserted.add(hit[0])
+    return inserted
 
 def digits_only_int(s: str) -> int:
-    nums = re.findall(r"\d+", (s or "").replace(",", ""))
-    return int("".join(nums)) if nums else 0
+    # ★正規表現を使わず数字だけ残す（isdecimal は \d と同じ判定。カンマ等は自然に落ちる）
+    t = "".join(filter(str.isdecimal, s or ""))
+    return int(t) if t else 0
 
 def normalize_post_date(raw: str) -> str:
     txt = (raw or "").strip()
     if not txt:
         return "1970-01-01 00:00:00"
+    return _normalize_post_date_cached(txt)
+
+# ★同じ日付文字列は一覧で何度も出るので、dtparser.parse（fuzzy）の結果を使い回す
+@lru_cache(maxsize=4096)
+def _normalize_post_date_cached(txt: str) -> str:
+    # 既知の書式は正規表現で直接組み立てる（dateutil の fuzzy 解析は遅い）
+    m = RE_LIST_DT.match(txt)
+    if m:
+        y, mo, d, hh, mi, ss = m.groups()
+        try:
+            year = int(y) if y else datetime.now(JST).year
+            dt = datetime(year, int(mo), int(d), int(hh), int(mi), int(ss or 0))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
     try:
         dt = dtparser.parse(txt, fuzzy=True)
         return dt.strftime("%Y-%m-%d %H:%M:%S")
     except Exception:
         return txt
 
+_BLOCK_RESOURCE_SET = frozenset(BLOCK_RESOURCE_TYPES)
+
+def block_heavy_resources(route) -> None:
+    """画像/CSS/フォントなど一覧の読み取りに不要なリクエストは中止する。"""
+    if route.request.resource_type in _BLOCK_RESOURCE_SET:
+        route.abort()
+    else:
+        route.continue_()
+
 def short(s: str, n: int = 70) -> str:
     s = (s or "").replace("\n", " ").strip()
     return s if len(s) <= n else s[: n - 1] + "…"
 
+_PAGE_PARAMS = PARAMS or ""  # ページごとに or "" しないよう1回だけ正規化
+
 def build_page_url(page_no: int) -> str:
-    return f"{BASE_URL}/{page_no}/" + (PARAMS or "")
+    return f"{BASE_URL}/{page_no}/{_PAGE_PARAMS}"
 
 def build_post_title(title: str) -> str:
     raw = (title or "").strip()
-    core = re.sub(r"【[^】]{1,30}】", "", raw).strip()
-    core = re.sub(r"\b(PART|Part|part)\s*\d+\b", "", core).strip()
-    core = re.sub(r"[#＃]\s*\d+\b", "", core).strip()
-    core = re.sub(r"(第\s*\d+\s*(回|弾))", "", core).strip()
-    core = re.sub(r"(パート|Part|PART)\s*\d+\s*$", "", core).strip()
-    core = re.sub(r"\s{2,}", " ", core).strip(" 　-–—_:：")
+    core = RE_PT_BRACKET.sub("", raw).strip()
+    core = RE_PT_NUMBERING.sub("", core).strip()
+    core = RE_PT_PART_TAIL.sub("", core).strip()
+    core = RE_PT_WS.sub(" ", core).strip(" 　-–—_:：")
     return core if core else raw
 
 def main():
@@ -187,8 +316,16 @@ def main():
 
     con = connect(DB_PATH)
     ensure_columns(con)
+    # ★既存IDは起動時に1回だけ読む（以降に別プロセスが入れた分は insert_new_many の DO NOTHING で守られる）
+    known_ids: Set[str] = set()
+    if not UPDATE_EXISTING:
+        con_ro = connect_ro(DB_PATH)
+        try:
+            known_ids = load_known_ids(con_ro)
+        finally:
+            con_ro.close()
 
-    check_date = datetime.now(ZoneInfo("Asia/Tokyo")).strftime("%Y-%m-%d")
+    check_date = datetime.now(JST).date().isoformat()
 
     saved = 0
     pages_done = 0
@@ -205,6 +342,8 @@ def main():
     print(f"[INFO] target_save: {TARGET_NEW_COUNT}")
     print(f"[INFO] min_comments: {MIN_COMMENTS}")
     print(f"[INFO] update_existing: {UPDATE_EXISTING}")
+    if not UPDATE_EXISTING:
+        print(f"[INFO] known_ids: {len(known_ids)}")
     print(f"[INFO] base_url(full): {BASE_URL}/?{(PARAMS or '').lstrip('?')}")
     print(f"[INFO] base_url: {BASE_URL}")
     print(f"[INFO] params: {PARAMS}")
@@ -219,6 +358,8 @@ def main():
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=HEADLESS)
         context = browser.new_context(locale="ja-JP")
+        if _BLOCK_RESOURCE_SET:
+            context.route("**/*", block_heavy_resources)
         page = context.new_page()
 
         try:
@@ -245,49 +386,53 @@ def main():
                     time.sleep(SLEEP_SEC)
                     continue
 
-                li_locator = page.locator("xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li")
-                li_count = li_locator.count()
-                if li_count == 0:
+                # ★ページ内の li を1回の evaluate でまとめて取得
+                try:
+                    list_rows: List[Dict[str, Any]] = page.evaluate(JS_LIST_ROWS)
+                except Exception as e:
+                    failed_page += 1
+                    print(f"[PAGE_EVAL_FAIL] page={page_no} url={url} err={e}")
+                    time.sleep(SLEEP_SEC)
+                    continue
+                if not list_rows:
                     print(f"[NO_ITEMS] page={page_no} url={url}")
                     break
 
-                # ★ページ内を「コメント多い順 → post_date古い順」で整列してから保存
-                page_rows: List[Tuple[int, Dict[str, Any]]] = []
-
-                for idx in range(1, li_count + 1):
+                # ★1周目：href から id だけ集める
+                page_tids: List[Tuple[int, str, Dict[str, Any]]] = []
+                for idx, item in enumerate(list_rows, start=1):
                     seen += 1
 
-                    a = page.locator(f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a").first
-                    href = a.get_attribute("href") or ""
-                    m = RE_TOPIC_HREF.search(href)
+                    m = RE_TOPIC_HREF.search(item.get("href") or "")
                     if not m:
                         failed_item += 1
                         continue
-                    tid = m.group(1)
-
-                    try:
-                        comments_raw = page.locator(
-                            f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[2]"
-                        ).first.inner_text(timeout=5000).strip()
-                        post_raw = page.locator(
-                            f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[3]"
-                        ).first.inner_text(timeout=5000).strip()
-                        title = page.locator(
-                            f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/p"
-                        ).first.inner_text(timeout=5000).strip()
-                    except PWTimeoutError:
+                    page_tids.append((idx, m.group(1), item))
+
+                # ★ページ内を「コメント多い順 → post_date古い順」で整列してから保存
+                page_rows: List[Tuple[Tuple[int, str], int, Dict[str, Any]]] = []
+
+                for idx, tid, item in page_tids:
+                    # 既存IDは中身を見る前に飛ばす
+                    if (not UPDATE_EXISTING) and tid in known_ids:
+                        skipped_exists += 1
+                        continue
+
+                    comments_raw = item.get("c")
+                    post_raw = item.get("post")
+                    title = item.get("title")
+                    if comments_raw is None or post_raw is None or title is None:
                         failed_item += 1
                         continue
+                    comments_raw = comments_raw.strip()
+                    post_raw = post_raw.strip()
+                    title = title.strip()
 
                     comments_count = digits_only_int(comments_raw)
                     if comments_count < MIN_COMMENTS:
                         skipped_under_min += 1
                         continue
 
-                    if (not UPDATE_EXISTING) and exists_id(con, tid):
-                        skipped_exists += 1
-                        continue
-
                     post_date = normalize_post_date(post_raw)
 
                     row: Dict[str, Any] = {
@@ -303,19 +448,25 @@ def main():
                     if ENABLE_POST_TITLE:
                         row["post_title"] = build_post_title(title)
 
-                    page_rows.append((idx, row))
+                    page_rows.append(((-comments_count, post_date), idx, row))
 
                 # ソート: comments_count DESC, post_date ASC
-                page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["post_date"])))
+                page_rows.sort(key=itemgetter(0))  # キーは append 時に作成済み
 
-                page_saved = 0
-                for orig_idx, row in page_rows:
-                    if saved >= TARGET_NEW_COUNT:
-                        break
-
-                    upsert(con, row)
-                    con.commit()
+                # 目標件数までの分だけ、ページ単位で1トランザクションにまとめて保存
+                page_rows = page_rows[:max(0, TARGET_NEW_COUNT - saved)]
+                if UPDATE_EXISTING:
+                    upsert_many(con, [row for _, _, row in page_rows])
+                else:
+                    inserted = insert_new_many(con, [row for _, _, row in page_rows])
+                    known_ids.update(inserted)
+                    if len(inserted) < len(page_rows):
+                        # 既存チェックの後に別プロセスが入れた id は既存扱い
+                        skipped_exists += len(page_rows) - len(inserted)
+                        page_rows = [t for t in page_rows if t[2]["id"] in inserted]
 
+                page_saved = 0
+                for _, orig_idx, row in page_rows:
                     saved += 1
                     page_saved += 1
                     pbar.update(1)
@@ -346,6 +497,9 @@ def main():
             pbar.close()
 
         finally:
+            # 保存はページ単位の upsert_many で COMMIT 済み。念のため残りがあれば確定してから閉じる
+            if con.in_transaction:
+                con.commit()
             con.close()
             context.close()
             browser.close()
@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import annotations
+import queue
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Set, Optional
 import sqlite3
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -33,10 +38,16 @@ UPDATE_EXISTING = False          # ★既存IDも更新するならTrue（基本
 HEADLESS = True
 SLEEP_SEC = 0.6
 TIMEOUT_MS = 30000
+BLOCK_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")  # ★一覧はテキストしか読まないので取得しない（空で無効）
 
 ECHO_EACH_SAVE = True            # 保存ごとにターミナル表示
 EARLY_STOP_PAGES = 2             # 保存0件ページが連続したら終了（0で無効）※カテゴリごとに判定
 
+CATEGORY_WORKERS = 0             # カテゴリを並列に巡回するスレッド数（0=カテゴリ数 / 1=従来どおり順番に）
+                                 # ※既定の 0（2以上も同じ）はカテゴリを同時に回すので、従来の「CATEGORIES の並び順で
+                                 #   保存枠を埋める」優先順位は無くなる（先に見つけたカテゴリから埋まる）。順番を守るなら 1
+WRITE_QUEUE_PAGES = 8            # 書き込み待ちにできるページ数（超えたら巡回側が待つ）
+
 # 投稿用タイトルだけ作る（post_tags / post_desc は廃止）
 ENABLE_POST_TITLE = True
 
@@ -52,6 +63,10 @@ class CategoryConfig:
     base_url: str
     params: str
 
+    def __post_init__(self) -> None:
+        # params は作成時に1回だけ正規化（None でもページごとに or "" しなくて済むように）
+        object.__setattr__(self, "params", self.params or "")
+
 CATEGORIES: List[CategoryConfig] = [
     CategoryConfig(
         name="ゴシップ",
@@ -71,6 +86,8 @@ CATEGORIES: List[CategoryConfig] = [
 ]
 # =========================================================
 
+JST = ZoneInfo("Asia/Tokyo")
+
 DDL = """
 CREATE TABLE IF NOT EXISTS items (
   id TEXT PRIMARY KEY,
@@ -86,28 +103,76 @@ CREATE TABLE IF NOT EXISTS items (
   keywords_drop TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_items_post_date ON items(post_date);
 CREATE INDEX IF NOT EXISTS idx_items_check_date ON items(check_date);
-CREATE INDEX IF NOT EXISTS idx_items_comments ON items(comments_count);
 CREATE INDEX IF NOT EXISTS idx_items_check_create ON items(check_create);
 
 -- ★ソート用（コメント数: 多い順 / post_date: 古い順）
 -- SQLiteは ASC/DESC 付きインデックスをサポートします。
+-- comments_count 単独の検索もこの複合インデックスで足りるので、単独インデックスは作らない。
 CREATE INDEX IF NOT EXISTS idx_items_sort_cc_desc_pd_asc
   ON items(comments_count DESC, post_date ASC);
 """
 
+# check_create / keywords_* は UPDATE 側に入れない（upsert_many の注意を参照）
+UPSERT_SQL = """
+INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+  check_date=excluded.check_date,
+  post_date=excluded.post_date,
+  comments_count=excluded.comments_count,
+  category=excluded.category,
+  title=excluded.title,
+  post_title=excluded.post_title
+"""
+
+# ★UPDATE_EXISTING=False 用：既存IDには触らず、実際に入った id だけ返す（確認と INSERT の間に入った行も上書きしない）
+INSERT_NEW_SQL = """
+INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO NOTHING
+RETURNING id
+"""
+
 RE_TOPIC_HREF = re.compile(r"/topics/(\d+)/")
+# 一覧の日時（例: 2024/01/07 19:20 / 01/07 19:20 / 2024/01/07(日) 19:20:05）。外れたら dateutil に回す
+RE_LIST_DT = re.compile(
+    r"^\s*(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})(?:\s*\([^)]*\))?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$"
+)
+
+# build_post_title 用（毎回 re.sub に文字列を渡さず、コンパイル済みを使う）
+# 【】を消すと前後がくっついて \b などの判定が変わるので、【】だけは先に別パスで消す
+RE_PT_BRACKET = re.compile(r"【[^】]{1,30}】")
+# PART n / #n / 第n回・弾 は1パスでまとめて消す
+RE_PT_NUMBERING = re.compile(r"\b(?:PART|Part|part)\s*\d+\b|[#＃]\s*\d+\b|第\s*\d+\s*(?:回|弾)")
+# 末尾アンカーは上を消した後の末尾で判定するので最後に別パス
+RE_PT_PART_TAIL = re.compile(r"(?:パート|Part|PART)\s*\d+\s*$")
+RE_PT_WS = re.compile(r"\s{2,}")
 
 def connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(str(db_path), timeout=30)
-    con.execute("PRAGMA journal_mode=WAL;")
+    # 書き込みは db_writer スレッドが行うので、作成スレッド以外からの利用を許可
+    con = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+    con.execute(f"PRAGMA journal_mode={CFG.SQLITE_JOURNAL_MODE};")  # 他のスクリプトと同じ値（既定 WAL）
     con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA mmap_size=268435456;")  # 256MB
+    con.execute("PRAGMA cache_size=-65536;")    # 約64MB（既定の約2MBだとインデックスが多く足りない）
+    con.execute("PRAGMA wal_autocheckpoint=1000;")
+    con.execute("PRAGMA busy_timeout=60000;")
     con.executescript(DDL)
     con.commit()
     return con
 
+def connect_ro(db_path: Path) -> sqlite3.Connection:
+    """
+    既存チェック（SELECT）専用の読み取り接続。
+    WAL なので書き込み接続の COMMIT 済みデータが読める。書き込みとは文キャッシュも分かれる。
+    """
+    con = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+    con.execute("PRAGMA query_only=1;")
+    return con
+
 def ensure_columns(con: sqlite3.Connection) -> None:
     """
     既存DBにも安全に追記できるように、カラムが無ければALTERで追加。
@@ -132,30 +197,52 @@ def ensure_columns(con: sqlite3.Connection) -> None:
             if name not in cols:
                 con.execute(f"ALTER TABLE items ADD COLUMN {name} TEXT;")
 
+    # ★旧DDLの単独インデックスを削除（UPSERT ごとの B-tree 更新を減らす）
+    # comments_count は複合インデックスの先頭キー、post_date は下流が check_create で絞ってから並べるだけ
+    dropped = False
+    for name in ("idx_items_comments", "idx_items_post_date"):
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone():
+            con.execute(f"DROP INDEX {name};")
+            dropped = True
+    if dropped:
+        con.execute("ANALYZE;")
+
     con.commit()
 
-def exists_id(con: sqlite3.Connection, tid: str) -> bool:
-    return con.execute("SELECT 1 FROM items WHERE id=? LIMIT 1", (tid,)).fetchone() is not None
+# 一覧ページの li をまとめて読む（li ごと・項目ごとに locator で往復しない）
+# ★従来の XPath（/html/body/div[1]/div[1]/div[1]/ul[2]/li, ./a/div/p/span[2] ...）と同じ位置を CSS で引く
+#   XPath の div[1] / span[2] は「同名要素の何番目か」なので :nth-of-type で対応させる
+#   querySelectorAll はブラウザ側のネイティブ実装で、li ごとに root から辿り直さない
+# 取れなかった項目は null で返す
+JS_LIST_ROWS = """
+() => {
+  const text = (li, sel) => {
+    const n = li.querySelector(sel);
+    return n ? n.innerText : null;
+  };
+  const lis = document.querySelectorAll(
+    ":root > body > div:nth-of-type(1) > div:nth-of-type(1) > div:nth-of-type(1) > ul:nth-of-type(2) > li"
+  );
+  const out = [];
+  for (const li of lis) {
+    const a = li.querySelector(":scope > a");
+    out.push({
+      href: a ? (a.getAttribute("href") || "") : "",
+      c: text(li, ":scope > a > div > p > span:nth-of-type(2)"),
+      post: text(li, ":scope > a > div > p > span:nth-of-type(3)"),
+      title: text(li, ":scope > a > p"),
+    });
+  }
+  return out;
+}
+"""
 
-def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    """
-    注意:
-    - check_create は “新規INSERT時のみ” row側（基本0）を入れる
-    - 既存UPDATE時は check_create を上書きしない（別スクリプトの判定に使うため）
-    - keywords_* もこのスクリプトでは触らない（別スクリプト担当）
-    """
-    sql = """
-    INSERT INTO items (id, check_create, check_date, post_date, comments_count, category, title, post_title)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(id) DO UPDATE SET
-      check_date=excluded.check_date,
-      post_date=excluded.post_date,
-      comments_count=excluded.comments_count,
-      category=excluded.category,
-      title=excluded.title,
-      post_title=excluded.post_title
-    """
-    con.execute(sql, (
+def load_known_ids(con: sqlite3.Connection) -> Set[str]:
+    """items の id を全件読む（既存判定は実行中ずっとメモリ上の set で行い、ページごとに SELECT しない）。"""
+    return {r[0] for r in con.execute("SELECT id FROM items")}
+
+def upsert_params(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
         row["id"],
         int(row.get("check_create", 0)),
         row["check_date"],
@@ -164,224 +251,442 @@ def upsert(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
         row["category"],
         row["title"],
         row.get("post_title"),
-    ))
+    )
+
+def upsert_many(con: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    """
+    1ページ分をまとめて UPSERT して1回だけ COMMIT する（行ごとの COMMIT = fsync をやめる）。
+
+    注意:
+    - check_create は “新規INSERT時のみ” row側（基本0）を入れる
+    - 既存UPDATE時は check_create を上書きしない（別スクリプトの判定に使うため）
+    - keywords_* もこのスクリプトでは触らない（別スクリプト担当）
+    """
+    if not rows:
+        return
+    with con:
+        con.executemany(UPSERT_SQL, [upsert_params(r) for r in rows])
+
+def insert_new_many(con: sqlite3.Connection, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    1ページ分を新規だけ INSERT（既存は DO NOTHING）して1回だけ COMMIT し、実際に入った id を返す。
+    executemany では RETURNING の結果が取れないので、1トランザクションの中で1行ずつ実行する。
+    """
+    inserted: Set[str] = set()
+    if not rows:
+        return inserted
+    with con:
+        for r in rows:
+            hit = con.execute(INSERT_NEW_SQL, upsert_params(r)).fetchone()
+            if hit is not None:
+                inserted.add(hit[0])
+    return inserted
 
 def digits_only_int(s: str) -> int:
-    nums = re.findall(r"\d+", (s or "").replace(",", ""))
-    return int("".join(nums)) if nums else 0
+    # ★正規表現を使わず数字だけ残す（isdecimal は \d と同じ判定。カンマ等は自然に落ちる）
+    t = "".join(filter(str.isdecimal, s or ""))
+    return int(t) if t else 0
 
 def normalize_post_date(raw: str) -> str:
     txt = (raw or "").strip()
     if not txt:
         return "1970-01-01 00:00:00"
+    return _normalize_post_date_cached(txt)
+
+# ★同じ日付文字列は一覧で何度も出るので、dtparser.parse（fuzzy）の結果を使い回す
+@lru_cache(maxsize=4096)
+def _normalize_post_date_cached(txt: str) -> str:
+    # 既知の書式は正規表現で直接組み立てる（dateutil の fuzzy 解析は遅い）
+    m = RE_LIST_DT.match(txt)
+    if m:
+        y, mo, d, hh, mi, ss = m.groups()
+        try:
+            year = int(y) if y else datetime.now(JST).year
+            dt = datetime(year, int(mo), int(d), int(hh), int(mi), int(ss or 0))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
     try:
         dt = dtparser.parse(txt, fuzzy=True)
         return dt.strftime("%Y-%m-%d %H:%M:%S")
     except Exception:
         return txt
 
+_BLOCK_RESOURCE_SET = frozenset(BLOCK_RESOURCE_TYPES)
+
+def block_heavy_resources(route) -> None:
+    """画像/CSS/フォントなど一覧の読み取りに不要なリクエストは中止する。"""
+    if route.request.resource_type in _BLOCK_RESOURCE_SET:
+        route.abort()
+    else:
+        route.continue_()
+
 def short(s: str, n: int = 70) -> str:
     s = (s or "").replace("\n", " ").strip()
     return s if len(s) <= n else s[: n - 1] + "…"
 
 def build_page_url(cfg: CategoryConfig, page_no: int) -> str:
-    return f"{cfg.base_url}/{page_no}/" + (cfg.params or "")
+    return f"{cfg.base_url}/{page_no}/{cfg.params}"
 
 def build_post_title(title: str) -> str:
     raw = (title or "").strip()
-    core = re.sub(r"【[^】]{1,30}】", "", raw).strip()
-    core = re.sub(r"\b(PART|Part|part)\s*\d+\b", "", core).strip()
-    core = re.sub(r"[#＃]\s*\d+\b", "", core).strip()
-    core = re.sub(r"(第\s*\d+\s*(回|弾))", "", core).strip()
-    core = re.sub(r"(パート|Part|PART)\s*\d+\s*$", "", core).strip()
-    core = re.sub(r"\s{2,}", " ", core).strip(" 　-–—_:：")
+    core = RE_PT_BRACKET.sub("", raw).strip()
+    core = RE_PT_NUMBERING.sub("", core).strip()
+    core = RE_PT_PART_TAIL.sub("", core).strip()
+    core = RE_PT_WS.sub(" ", core).strip(" 　-–—_:：")
     return core if core else raw
 
-def main():
-    if TARGET_NEW_COUNT <= 0:
-        raise SystemExit("TARGET_NEW_COUNT は 1以上にしてください")
-    if PAGE_FROM <= 0 or PAGE_TO <= 0 or PAGE_TO < PAGE_FROM:
-        raise SystemExit("PAGE_FROM/PAGE_TO の指定が不正です")
-    if MIN_COMMENTS < 0:
-        raise SystemExit("MIN_COMMENTS は 0以上にしてください")
-    if not CATEGORIES:
-        raise SystemExit("CATEGORIES が空です")
-
-    con = connect(DB_PATH)
-    ensure_columns(con)
-
-    check_date = datetime.now(ZoneInfo("Asia/Tokyo")).strftime("%Y-%m-%d")
-
-    saved = 0
-    pages_done = 0
-    seen = 0
-    skipped_exists = 0
-    skipped_under_min = 0
-    failed_item = 0
-    failed_page = 0
-
-    print(f"[INFO] DB: {DB_PATH}")
-    print(f"[INFO] check_date: {check_date}")
-    print(f"[INFO] page_from..to: {PAGE_FROM}..{PAGE_TO}")
-    print(f"[INFO] target_save(total): {TARGET_NEW_COUNT}")
-    print(f"[INFO] min_comments: {MIN_COMMENTS}")
-    print(f"[INFO] update_existing: {UPDATE_EXISTING}")
-    print(f"[INFO] categories: {', '.join([c.name for c in CATEGORIES])}")
-    for c in CATEGORIES:
-        print(f"  - {c.name}: {c.base_url}/?{(c.params or '').lstrip('?')}")
-    print(f"[INFO] early_stop_pages(per_category): {EARLY_STOP_PAGES}")
-    print(f"[INFO] post_title: {ENABLE_POST_TITLE}")
-    print("[INFO] check_create: 0=未処理 / 1=処理対象 / 2=完了（※このスクリプトは新規0、既存は上書きしない）")
-    print("[INFO] sort_rule: comments_count DESC, post_date ASC (ページ内で整列してUPSERT)")
-    if ENABLE_TAG_LEARNING_COLUMNS:
-        print("[INFO] tag_learning_columns: keywords_raw / keywords_keep / keywords_drop (added if missing)")
+class CrawlShared:
+    """
+    カテゴリ巡回スレッド間で共有する状態。
+    - 保存枠（TARGET_NEW_COUNT）の確保と、投入済み（未COMMITを含む）IDの記録は lock の中でまとめて行う
+    - 枠が埋まっても書き込み待ち（pending）が残っている間は saved が確定していない
+      （書き込みで既存だった分は枠に戻る）ので、巡回側は wait_settled で確定を待ってから止める
+    - 集計カウンタもここに足し込む
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.stop = threading.Event()  # 異常終了（他のカテゴリも止める）
+        self.full = threading.Event()  # 保存枠（TARGET_NEW_COUNT）が埋まった
+        self.saved = 0
+        self.pending = 0  # reserve 済みで db_writer がまだ書き終えていない行数
+        self.known: Set[str] = set()  # DB に既にある id + 保存対象にした（書き込み待ちを含む）id
+        self.stats: Dict[str, int] = {
+            "pages_done": 0,
+            "seen": 0,
+            "skipped_exists": 0,
+            "skipped_under_min": 0,
+            "failed_item": 0,
+            "failed_page": 0,
+        }
+        self.writer_error: Optional[BaseException] = None
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for k, v in counts.items():
+                self.stats[k] += v
+
+    def known_in(self, ids: List[str]) -> Set[str]:
+        """ids のうち既存扱いにするもの（起動時の DB + 書き込み待ちを含む保存対象）。"""
+        with self.lock:
+            return {tid for tid in ids if tid in self.known}
+
+    def settle(self, n: int, lost: int = 0) -> None:
+        """
+        db_writer が n 行を書き終えた（or 捨てた）ことを記録する。
+        lost 件は実際には保存されなかったので既存扱いに戻し、枠が空けば full を解除する。
+        """
+        with self.cond:
+            self.pending -= n
+            if lost:
+                self.saved -= lost
+                self.stats["skipped_exists"] += lost
+                if self.saved < TARGET_NEW_COUNT:
+                    self.full.clear()
+            self.cond.notify_all()
+
+    def wait_settled(self) -> bool:
+        """
+        枠が埋まっているなら、書き込み待ちが無くなるまで（or 枠が空くまで）待つ。
+        返り値: 枠が空いていて巡回を続けられるなら True
+        """
+        with self.cond:
+            while self.full.is_set() and self.pending > 0 and not self.stop.is_set():
+                self.cond.wait(timeout=1.0)  # stop は main 側からも立つので定期的に見直す
+            return not self.full.is_set() and not self.stop.is_set()
+
+    def reserve(self, rows: List[Tuple[Tuple[int, str], int, Dict[str, Any]]]) -> Tuple[List[Tuple[Tuple[int, str], int, Dict[str, Any]]], int]:
+        """残り枠の分だけ rows を確保する。返り値: (確保した rows, 確保前の saved)"""
+        with self.lock:
+            before = self.saved
+            taken = rows[:max(0, TARGET_NEW_COUNT - before)]
+            self.saved += len(taken)
+            self.pending += len(taken)
+            self.known.update(row["id"] for _, _, row in taken)
+            if self.saved >= TARGET_NEW_COUNT:
+                self.full.set()
+            return taken, before
+
+def db_writer(con: sqlite3.Connection, q: "queue.Queue[Optional[List[Dict[str, Any]]]]", shared: CrawlShared, pbar) -> None:
+    """唯一の書き込みスレッド。キューに来たページ単位の rows を upsert_many（1ページ=1COMMIT）。"""
+    while True:
+        rows = q.get()
+        if rows is None:
+            return
+        if shared.writer_error is not None:
+            shared.settle(len(rows))
+            continue  # 失敗後はキューを捨てて、巡回側の put が詰まらないようにする
+        try:
+            lost = 0
+            if UPDATE_EXISTING:
+                upsert_many(con, rows)
+            else:
+                inserted = insert_new_many(con, rows)
+                lost = len(rows) - len(inserted)
+                if lost:
+                    # 既存チェックの後に別プロセスが入れた id は既存扱い（保存件数から戻す）
+                    pbar.update(-lost)
+                    print(f"[EXISTS_RACE] {lost} rows already in DB -> not overwritten")
+            shared.settle(len(rows), lost)
+        except BaseException as e:
+            shared.writer_error = e
+            shared.stop.set()
+            shared.settle(len(rows))
+
+def crawl_category(
+    cfg: CategoryConfig,
+    check_date: str,
+    shared: CrawlShared,
+    q: "queue.Queue[Optional[List[Dict[str, Any]]]]",
+    pbar,
+) -> None:
+    """1カテゴリ分を巡回する（スレッドごとに Playwright を持つ）。"""
+    print(f"\n[CATEGORY] {cfg.name}  base={cfg.base_url}  params={cfg.params}")
+    consecutive_no_save_pages = 0  # カテゴリごとにリセット
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=HEADLESS)
         context = browser.new_context(locale="ja-JP")
+        if _BLOCK_RESOURCE_SET:
+            context.route("**/*", block_heavy_resources)
         page = context.new_page()
 
         try:
-            pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved")
+            for page_no in range(PAGE_FROM, PAGE_TO + 1):
+                if shared.stop.is_set():
+                    break
+                # 枠が埋まっていても、書き込み待ちの確定で枠が戻れば巡回を続ける
+                if shared.full.is_set() and not shared.wait_settled():
+                    break
+
+                shared.add(pages_done=1)
+                url = build_page_url(cfg, page_no)
 
-            # ★カテゴリごとに巡回
-            for cfg in CATEGORIES:
-                if saved >= TARGET_NEW_COUNT:
+                try:
+                    resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS)
+                    status = resp.status if resp else None
+                    if (not resp) or (status and status >= 400):
+                        shared.add(failed_page=1)
+                        print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
+                        time.sleep(SLEEP_SEC)
+                        continue
+                except PWTimeoutError:
+                    shared.add(failed_page=1)
+                    print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
+                    time.sleep(SLEEP_SEC)
+                    continue
+
+                # ★ページ内の li を1回の evaluate でまとめて取得
+                try:
+                    list_rows: List[Dict[str, Any]] = page.evaluate(JS_LIST_ROWS)
+                except Exception as e:
+                    shared.add(failed_page=1)
+                    print(f"[PAGE_EVAL_FAIL] cat={cfg.name} page={page_no} url={url} err={e}")
+                    time.sleep(SLEEP_SEC)
+                    continue
+                if not list_rows:
+                    print(f"[NO_ITEMS] cat={cfg.name} page={page_no} url={url}")
                     break
 
-                print(f"\n[CATEGORY] {cfg.name}  base={cfg.base_url}  params={cfg.params}")
-                consecutive_no_save_pages = 0  # カテゴリごとにリセット
+                seen = 0
+                skipped_exists = 0
+                skipped_under_min = 0
+                failed_item = 0
 
-                for page_no in range(PAGE_FROM, PAGE_TO + 1):
-                    if saved >= TARGET_NEW_COUNT:
-                        break
+                # ★1周目：href から id だけ集める（既存チェックはページ単位で1回だけ lock を取る）
+                page_tids: List[Tuple[int, str, Dict[str, Any]]] = []
+                for idx, item in enumerate(list_rows, start=1):
+                    seen += 1
 
-                    pages_done += 1
-                    url = build_page_url(cfg, page_no)
-
-                    try:
-                        resp = page.goto(url, wait_until="domcontentloaded", timeout=TIMEOUT_MS)
-                        status = resp.status if resp else None
-                        if (not resp) or (status and status >= 400):
-                            failed_page += 1
-                            print(f"[PAGE_FAIL] cat={cfg.name} page={page_no} status={status} url={url}")
-                            time.sleep(SLEEP_SEC)
-                            continue
-                    except PWTimeoutError:
-                        failed_page += 1
-                        print(f"[PAGE_TIMEOUT] cat={cfg.name} page={page_no} url={url}")
-                        time.sleep(SLEEP_SEC)
+                    m = RE_TOPIC_HREF.search(item.get("href") or "")
+                    if not m:
+                        failed_item += 1
                         continue
+                    page_tids.append((idx, m.group(1), item))
 
-                    li_locator = page.locator("xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li")
-                    li_count = li_locator.count()
-                    if li_count == 0:
-                        print(f"[NO_ITEMS] cat={cfg.name} page={page_no} url={url}")
-                        break
+                existing: Set[str] = set()
+                if not UPDATE_EXISTING:
+                    existing = shared.known_in([tid for _, tid, _ in page_tids])
+
+                # ★ページ内を「コメント多い順 → post_date古い順」で整列してから保存
+                page_rows: List[Tuple[Tuple[int, str], int, Dict[str, Any]]] = []
+
+                for idx, tid, item in page_tids:
+                    # 既存IDは中身を見る前に飛ばす
+                    if (not UPDATE_EXISTING) and tid in existing:
+                        skipped_exists += 1
+                        continue
+
+                    comments_raw = item.get("c")
+                    post_raw = item.get("post")
+                    title = item.get("title")
+                    if comments_raw is None or post_raw is None or title is None:
+                        failed_item += 1
+                        continue
+                    comments_raw = comments_raw.strip()
+                    post_raw = post_raw.strip()
+                    title = title.strip()
 
-                    # ★ページ内を「コメント多い順 → post_date古い順」で整列してから保存
-                    page_rows: List[Tuple[int, Dict[str, Any]]] = []
-
-                    for idx in range(1, li_count + 1):
-                        seen += 1
-
-                        a = page.locator(f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a").first
-                        href = a.get_attribute("href") or ""
-                        m = RE_TOPIC_HREF.search(href)
-                        if not m:
-                            failed_item += 1
-                            continue
-                        tid = m.group(1)
-
-                        try:
-                            comments_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[2]"
-                            ).first.inner_text(timeout=5000).strip()
-                            post_raw = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/div/p/span[3]"
-                            ).first.inner_text(timeout=5000).strip()
-                            title = page.locator(
-                                f"xpath=/html/body/div[1]/div[1]/div[1]/ul[2]/li[{idx}]/a/p"
-                            ).first.inner_text(timeout=5000).strip()
-                        except PWTimeoutError:
-                            failed_item += 1
-                            continue
-
-                        comments_count = digits_only_int(comments_raw)
-                        if comments_count < MIN_COMMENTS:
-                            skipped_under_min += 1
-                            continue
-
-                        if (not UPDATE_EXISTING) and exists_id(con, tid):
-                            skipped_exists += 1
-                            continue
-
-                        post_date = normalize_post_date(post_raw)
-
-                        row: Dict[str, Any] = {
-                            "id": tid,
-                            "check_create": 0,     # 新規は必ず0
-                            "check_date": check_date,
-                            "post_date": post_date,
-                            "comments_count": comments_count,
-                            "category": cfg.name,  # ★カテゴリ名をここで付与
-                            "title": title,
-                            "post_title": None,
-                        }
-                        if ENABLE_POST_TITLE:
-                            row["post_title"] = build_post_title(title)
-
-                        page_rows.append((idx, row))
-
-                    # ソート: comments_count DESC, post_date ASC
-                    page_rows.sort(key=lambda t: (-int(t[1]["comments_count"]), str(t[1]["post_date"])))
-
-                    page_saved = 0
-                    for orig_idx, row in page_rows:
-                        if saved >= TARGET_NEW_COUNT:
-                            break
-
-                        upsert(con, row)
-                        con.commit()
-
-                        saved += 1
+                    comments_count = digits_only_int(comments_raw)
+                    if comments_count < MIN_COMMENTS:
+                        skipped_under_min += 1
+                        continue
+
+                    post_date = normalize_post_date(post_raw)
+
+                    row: Dict[str, Any] = {
+                        "id": tid,
+                        "check_create": 0,     # 新規は必ず0
+                        "check_date": check_date,
+                        "post_date": post_date,
+                        "comments_count": comments_count,
+                        "category": cfg.name,  # ★カテゴリ名をここで付与
+                        "title": title,
+                        "post_title": None,
+                    }
+                    if ENABLE_POST_TITLE:
+                        row["post_title"] = build_post_title(title)
+
+                    page_rows.append(((-comments_count, post_date), idx, row))
+
+                shared.add(
+                    seen=seen,
+                    skipped_exists=skipped_exists,
+                    skipped_under_min=skipped_under_min,
+                    failed_item=failed_item,
+                )
+
+                # ソート: comments_count DESC, post_date ASC
+                page_rows.sort(key=itemgetter(0))  # キーは append 時に作成済み
+
+                # 目標件数までの分だけ枠を確保し、書き込みスレッドへ渡す
+                #  枠が足りなければ書き込み待ちの確定を待ち、枠が戻った分だけ残りを確保し直す
+                page_saved = 0
+                rest = page_rows
+                while rest:
+                    taken, saved_before = shared.reserve(rest)
+                    rest = rest[len(taken):]
+                    if taken:
+                        q.put([row for _, _, row in taken])
+                        pbar.update(len(taken))
+
+                    for n, (_, orig_idx, row) in enumerate(taken, start=1):
                         page_saved += 1
-                        pbar.update(1)
 
                         if ECHO_EACH_SAVE:
                             print(
-                                f"[OK] cat={cfg.name} page={page_no} li={orig_idx} saved={saved} id={row['id']} "
+                                f"[OK] cat={cfg.name} page={page_no} li={orig_idx} saved={saved_before + n} id={row['id']} "
                                 f"post={row['post_date']} c={row['comments_count']} "
                                 f"title={short(row['title'],60)} "
                                 f"post_title={short(row.get('post_title') or '',40)} "
                                 f"check_create=0"
                             )
 
-                    if page_saved == 0:
-                        consecutive_no_save_pages += 1
-                        print(
-                            f"[NO_SAVE] cat={cfg.name} page={page_no} consecutive={consecutive_no_save_pages} "
-                            f"(under_min_total={skipped_under_min}, exists_total={skipped_exists}, failed_total={failed_item})"
-                        )
-                        if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
-                            print("[EARLY_STOP] no saved items for consecutive pages (this category) -> stop this category")
-                            break
-                    else:
-                        consecutive_no_save_pages = 0
+                    if rest and not shared.wait_settled():
+                        break
 
-                    time.sleep(SLEEP_SEC)
+                if page_saved == 0:
+                    consecutive_no_save_pages += 1
+                    st = shared.stats
+                    print(
+                        f"[NO_SAVE] cat={cfg.name} page={page_no} consecutive={consecutive_no_save_pages} "
+                        f"(under_min_total={st['skipped_under_min']}, exists_total={st['skipped_exists']}, failed_total={st['failed_item']})"
+                    )
+                    if EARLY_STOP_PAGES > 0 and consecutive_no_save_pages >= EARLY_STOP_PAGES:
+                        print(f"[EARLY_STOP] cat={cfg.name} no saved items for consecutive pages (this category) -> stop this category")
+                        break
+                else:
+                    consecutive_no_save_pages = 0
 
-            pbar.close()
+                time.sleep(SLEEP_SEC)
 
         finally:
-            con.close()
             context.close()
             browser.close()
 
+def main():
+    if TARGET_NEW_COUNT <= 0:
+        raise SystemExit("TARGET_NEW_COUNT は 1以上にしてください")
+    if PAGE_FROM <= 0 or PAGE_TO <= 0 or PAGE_TO < PAGE_FROM:
+        raise SystemExit("PAGE_FROM/PAGE_TO の指定が不正です")
+    if MIN_COMMENTS < 0:
+        raise SystemExit("MIN_COMMENTS は 0以上にしてください")
+    if not CATEGORIES:
+        raise SystemExit("CATEGORIES が空です")
+
+    con = connect(DB_PATH)
+    ensure_columns(con)
+
+    check_date = datetime.now(JST).date().isoformat()
+    workers = CATEGORY_WORKERS if CATEGORY_WORKERS > 0 else len(CATEGORIES)
+    workers = max(1, min(workers, len(CATEGORIES)))
+
+    print(f"[INFO] DB: {DB_PATH}")
+    print(f"[INFO] check_date: {check_date}")
+    print(f"[INFO] page_from..to: {PAGE_FROM}..{PAGE_TO}")
+    print(f"[INFO] target_save(total): {TARGET_NEW_COUNT}")
+    print(f"[INFO] min_comments: {MIN_COMMENTS}")
+    print(f"[INFO] update_existing: {UPDATE_EXISTING}")
+    print(f"[INFO] categories: {', '.join([c.name for c in CATEGORIES])}")
+    for c in CATEGORIES:
+        print(f"  - {c.name}: {c.base_url}/?{c.params.lstrip('?')}")
+    print(f"[INFO] category_workers: {workers}")
+    print(f"[INFO] early_stop_pages(per_category): {EARLY_STOP_PAGES}")
+    print(f"[INFO] post_title: {ENABLE_POST_TITLE}")
+    print("[INFO] check_create: 0=未処理 / 1=処理対象 / 2=完了（※このスクリプトは新規0、既存は上書きしない）")
+    print("[INFO] sort_rule: comments_count DESC, post_date ASC (ページ内で整列してUPSERT)")
+    if ENABLE_TAG_LEARNING_COLUMNS:
+        print("[INFO] tag_learning_columns: keywords_raw / keywords_keep / keywords_drop (added if missing)")
+
+    shared = CrawlShared()
+    # ★既存IDは起動時に1回だけ読む（以降に別プロセスが入れた分は insert_new_many の DO NOTHING で守られる）
+    if not UPDATE_EXISTING:
+        con_ro = connect_ro(DB_PATH)
+        try:
+            shared.known = load_known_ids(con_ro)
+        finally:
+            con_ro.close()
+        print(f"[INFO] known_ids: {len(shared.known)}")
+    q: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=WRITE_QUEUE_PAGES)
+    pbar = tqdm(total=TARGET_NEW_COUNT, desc="saved")
+    writer = threading.Thread(target=db_writer, args=(con, q, shared, pbar), name="db_writer", daemon=True)
+    writer.start()
+
+    try:
+        # ★カテゴリごとに巡回（スレッドごとに1カテゴリ。DB への書き込みは db_writer だけ）
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as ex:
+            futures = [ex.submit(crawl_category, cfg, check_date, shared, q, pbar) for cfg in CATEGORIES]
+            try:
+                for f in futures:
+                    f.result()
+            except BaseException:
+                shared.stop.set()  # 1つ落ちたら他のカテゴリも止める
+                raise
+    finally:
+        q.put(None)
+        writer.join()
+        pbar.close()
+        # 保存はページ単位の upsert_many で COMMIT 済み。念のため残りがあれば確定してから閉じる
+        if con.in_transaction:
+            con.commit()
+        con.close()
+
+    if shared.writer_error is not None:
+        raise shared.writer_error
+
+    saved = shared.saved
+    st = shared.stats
     print("\n[SUMMARY]")
     print(f"  saved={saved} target={TARGET_NEW_COUNT}")
-    print(f"  pages_done={pages_done} range={PAGE_FROM}..{PAGE_TO}  categories={len(CATEGORIES)}")
-    print(f"  seen={seen} under_min={skipped_under_min} skipped_exists={skipped_exists} failed_item={failed_item} failed_page={failed_page}")
+    print(f"  pages_done={st['pages_done']} range={PAGE_FROM}..{PAGE_TO}  categories={len(CATEGORIES)}")
+    print(
+        f"  seen={st['seen']} under_min={st['skipped_under_min']} skipped_exists={st['skipped_exists']} "
+        f"failed_item={st['failed_item']} failed_page={st['failed_page']}"
+    )
+    if 0 < saved < TARGET_NEW_COUNT:
+        print(f"  [WARN] 目標件数に {TARGET_NEW_COUNT - saved} 件足りません（対象ページを回り切った/早期終了/既存だった分を含む）。")
     if saved == 0:
         print("  [WARN] 保存が0件です。MIN_COMMENTSが高すぎる/ページ範囲が新しすぎる可能性があります。")
 
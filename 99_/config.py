@@ -29,6 +29,18 @@ def _env_bool(name: str, default: bool) -> bool:
     return bool(env_loader.env_bool(name, default))
 
 
+def _sqlite_journal_mode() -> str:
+    """
+    全スクリプト共通の journal_mode（同じ DB を開くので、ここで1回だけ決める）
+    - SQLITE_JOURNAL_MODE の既定は WAL
+    - SQLITE_WAL=false が明示されていれば WAL にはしない（ネットワーク共有上の DB など）→ SQLite 既定の DELETE
+    """
+    mode = (_env_str("SQLITE_JOURNAL_MODE", "WAL") or "WAL").strip()
+    if not _env_bool("SQLITE_WAL", True) and mode.upper() == "WAL":
+        return "DELETE"
+    return mode
+
+
 def _env_path(name: str, default: Optional[str]) -> Optional[Path]:
     return env_loader.env_path(name, default)
 
@@ -144,7 +156,7 @@ CFG = Config(
 
     BUSY_TIMEOUT_MS=_env_int("BUSY_TIMEOUT_MS", 60000),
     SQLITE_WAL=_env_bool("SQLITE_WAL", True),
-    SQLITE_JOURNAL_MODE=(_env_str("SQLITE_JOURNAL_MODE", "WAL") or "WAL").strip(),
+    SQLITE_JOURNAL_MODE=_sqlite_journal_mode(),
     SQLITE_SYNCHRONOUS=(_env_str("SQLITE_SYNCHRONOUS", "NORMAL") or "NORMAL").strip(),
     LOCK_RETRY_MAX=_env_int("LOCK_RETRY_MAX", 25),
     LOCK_RETRY_SLEEP_SEC=float(_env_float("LOCK_RETRY_SLEEP_SEC", 0.8)),
@@ -90,8 +90,8 @@ if not BASE_OUTPUT_ROOT:
 # --- 共通：SQLite運用（03などと揃える） ---
 BUSY_TIMEOUT_MS = CFG.BUSY_TIMEOUT_MS
 
-# 例：WAL / NORMAL
-SQLITE_JOURNAL_MODE = (CFG.SQLITE_JOURNAL_MODE or "WAL").strip()
+# 例：WAL / NORMAL（journal_mode は config で SQLITE_WAL も見て決めた値をそのまま使う）
+SQLITE_JOURNAL_MODE = CFG.SQLITE_JOURNAL_MODE
 SQLITE_SYNCHRONOUS = (CFG.SQLITE_SYNCHRONOUS or "NORMAL").strip()
 
 # --- 共通：DBロック運用 ---
@@ -12,10 +12,13 @@
 from __future__ import annotations
 
 import json
+import os
 import re
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Iterator
 
 from PIL import Image, ImageDraw, ImageFont
 
@@ -47,6 +50,12 @@ JP_FONT_CANDIDATES = [p.strip() for p in JP_FONT_PATHS_ENV.split(";") if p.strip
 ]
 EMOJI_FONT_PATH = queue_db._env_str("EMOJI_FONT_PATH", "/System/Library/Fonts/Apple Color Emoji.ttc").strip()
 
+# PNG の zlib 圧縮レベル（0-9）。中間ファイルなので速さ優先で 1
+PNG_COMPRESS_LEVEL = queue_db._env_int("PNG_COMPRESS_LEVEL", 1)
+
+# コメント画像を並列に作るプロセス数（0 以下なら CPU 数 / 1 なら逐次）
+IMAGE_WORKERS = queue_db._env_int("IMAGE_WORKERS", 0)
+
 # =========================
 # 入出力（フォルダ内）
 # =========================
@@ -91,23 +100,25 @@ def read_ndjson(path: Path) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
     if not path.exists():
         raise FileNotFoundError(f"入力が見つかりません: {path}")
 
-    lines = path.read_text(encoding="utf-8").splitlines()
-    if not lines:
-        raise ValueError("ndjson が空です")
-
-    first = json.loads(lines[0])
-    meta = first.get("meta")
-    if not isinstance(meta, dict) or not meta.get("title"):
-        raise ValueError("1行目に meta.title がありません（形式が想定と違う）")
-
+    # ファイル全体を文字列＋行リストにせず、1行ずつ読む
     items: List[Dict[str, Any]] = []
-    for ln in lines[1:]:
-        if not ln.strip():
-            continue
-        obj = json.loads(ln)
-        if "rank" not in obj or "text" not in obj:
-            continue
-        items.append(obj)
+    with path.open("r", encoding="utf-8") as fh:
+        first_line = fh.readline()
+        if not first_line:
+            raise ValueError("ndjson が空です")
+
+        first = json.loads(first_line)
+        meta = first.get("meta")
+        if not isinstance(meta, dict) or not meta.get("title"):
+            raise ValueError("1行目に meta.title がありません（形式が想定と違う）")
+
+        for ln in fh:
+            if not ln.strip():
+                continue
+            obj = json.loads(ln)
+            if "rank" not in obj or "text" not in obj:
+                continue
+            items.append(obj)
 
     if not items:
         raise ValueError("rank/text を持つ item が0件です")
@@ -119,19 +130,21 @@ def read_ndjson(path: Path) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
 _JP_FONT_CACHE: Dict[int, ImageFont.ImageFont] = {}
 _EMOJI_FONT_CACHE: Dict[int, Optional[ImageFont.ImageFont]] = {}
 
+# 存在確認はサイズごとではなく起動時に1回だけ
+_JP_FONT_EXISTING = [str(Path(fp)) for fp in JP_FONT_CANDIDATES if Path(fp).exists()]
+_EMOJI_FONT_EXISTS = Path(EMOJI_FONT_PATH).exists()
+
 
 def load_font_from_candidates(size: int) -> ImageFont.ImageFont:
     if size in _JP_FONT_CACHE:
         return _JP_FONT_CACHE[size]
-    for fp in JP_FONT_CANDIDATES:
-        p = Path(fp)
-        if p.exists():
-            try:
-                f = ImageFont.truetype(str(p), size)
-                _JP_FONT_CACHE[size] = f
-                return f
-            except Exception:
-                pass
+    for fp in _JP_FONT_EXISTING:
+        try:
+            f = ImageFont.truetype(fp, size)
+            _JP_FONT_CACHE[size] = f
+            return f
+        except Exception:
+            pass
     f = ImageFont.load_default()
     _JP_FONT_CACHE[size] = f
     return f
@@ -140,10 +153,9 @@ def load_font_from_candidates(size: int) -> ImageFont.ImageFont:
 def load_emoji_font(size: int) -> Optional[ImageFont.ImageFont]:
     if size in _EMOJI_FONT_CACHE:
         return _EMOJI_FONT_CACHE[size]
-    p = Path(EMOJI_FONT_PATH)
-    if p.exists():
+    if _EMOJI_FONT_EXISTS:
         try:
-            f = ImageFont.truetype(str(p), size)
+            f = ImageFont.truetype(str(Path(EMOJI_FONT_PATH)), size)
             _EMOJI_FONT_CACHE[size] = f
             return f
         except Exception:
@@ -154,44 +166,52 @@ def load_emoji_font(size: int) -> Optional[ImageFont.ImageFont]:
 
 
 # ======= 絵文字を壊さないための簡易グラフェム分割 =======
-def grapheme_clusters(s: str) -> List[str]:
-    clusters: List[str] = []
-    buf = ""
-    prev_was_zwj = False
-    for ch in s:
-        o = ord(ch)
-        is_zwj = (o == 0x200D)
-        is_vs16 = (o == 0xFE0F)
-        is_skin = (0x1F3FB <= o <= 0x1F3FF)
-        is_comb = (0x0300 <= o <= 0x036F)
-
-        if not buf:
-            buf = ch
-        else:
-            if prev_was_zwj or is_zwj or is_vs16 or is_skin or is_comb:
-                buf += ch
-            else:
-                clusters.append(buf)
-                buf = ch
-        prev_was_zwj = is_zwj
-    if buf:
-        clusters.append(buf)
-    return clusters
+# 直前の文字にくっつく文字：VS16 / スキントーン / 結合文字（ZWJ は前後両方にくっつく）
+# 判定は正規表現の文字クラス（C 側の表引き）に任せ、範囲の定義はここ1か所だけにする
+_CLUSTER_ZWJ = "\u200d"
+_CLUSTER_EXTEND_RANGES = "\ufe0f\U0001F3FB-\U0001F3FF\u0300-\u036F"
+_RE_CLUSTER_EXTEND = re.compile(f"[{_CLUSTER_ZWJ}{_CLUSTER_EXTEND_RANGES}]")
+# 1クラスタ = 先頭1文字（または ZWJ 連続＋次の1文字）＋（VS16/スキントーン/結合文字 か ZWJ 連続＋次の1文字）の繰り返し
+_RE_CLUSTER = re.compile(
+    f"(?:{_CLUSTER_ZWJ}+.?|.)(?:[{_CLUSTER_EXTEND_RANGES}]|{_CLUSTER_ZWJ}+.?)*",
+    re.DOTALL,
+)
+
+
+# 同じ文字列をフォントサイズごとに何度も分割するので結果をキャッシュ（共有するので tuple で返す）
+@lru_cache(maxsize=4096)
+def grapheme_clusters(s: str) -> Tuple[str, ...]:
+    # くっつく文字が無ければ1文字=1クラスタ（大半のコメントはここで終わる）
+    if not _RE_CLUSTER_EXTEND.search(s):
+        return tuple(s)
+    return tuple(_RE_CLUSTER.findall(s))
 
 
+_RE_EMOJI_CHAR = re.compile("[\U0001F300-\U0001FAFF\u2600-\u27BF\U0001F1E6-\U0001F1FF]")
+
+
+# クラスタはほぼ1文字で種類も限られるので結果をキャッシュ
+@lru_cache(maxsize=8192)
 def is_emoji_cluster(cluster: str) -> bool:
-    for ch in cluster:
-        o = ord(ch)
-        if (0x1F300 <= o <= 0x1FAFF) or (0x2600 <= o <= 0x27BF) or (0x1F1E6 <= o <= 0x1F1FF):
-            return True
-    return False
+    return _RE_EMOJI_CHAR.search(cluster) is not None
 
 
 # ======= タイトル短縮 =======
+_RE_WS = re.compile(r"\s+")
+_RE_LEAD_BRACKETS = re.compile(r"^(【[^】]{1,30}】\s*)+")
+
+# 順番どおりに消す（「まとめ」→「完全まとめ」の順なので「完全」が残る、という既存の挙動を保つ）
+TITLE_JUNK_WORDS = (
+    "最終結果", "結果まとめ", "まとめ", "完全版", "速報", "解説", "一覧", "総まとめ",
+    "徹底解説", "全まとめ", "完全まとめ", "最終", "決定版", "保存版",
+)
+TITLE_SEPARATORS = ("｜", "|", "／", "/", "・", "—", "－", "-", "：", ":")
+
+
 def normalize_title(s: str) -> str:
     s = s.strip()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"^(【[^】]{1,30}】\s*)+", "", s)
+    s = _RE_WS.sub(" ", s)
+    s = _RE_LEAD_BRACKETS.sub("", s)
     return s.strip()
 
 
@@ -199,17 +219,13 @@ def shorten_title_step(s: str, level: int) -> str:
     s = normalize_title(s)
 
     if level >= 1:
-        junk = [
-            "最終結果", "結果まとめ", "まとめ", "完全版", "速報", "解説", "一覧", "総まとめ",
-            "徹底解説", "全まとめ", "完全まとめ", "最終", "決定版", "保存版",
-        ]
-        for w in junk:
-            s = s.replace(w, "")
-        s = re.sub(r"\s+", " ", s).strip()
+        for w in TITLE_JUNK_WORDS:
+            if w in s:
+                s = s.replace(w, "")
+        s = _RE_WS.sub(" ", s).strip()
 
     if level >= 2:
-        seps = ["｜", "|", "／", "/", "・", "—", "－", "-", "：", ":"]
-        for sep in seps:
+        for sep in TITLE_SEPARATORS:
             if sep in s:
                 parts = [p.strip() for p in s.split(sep) if p.strip()]
                 if len(parts) >= 2:
@@ -217,7 +233,7 @@ def shorten_title_step(s: str, level: int) -> str:
                 elif len(parts) == 1:
                     s = parts[0]
                 break
-        s = re.sub(r"\s+", " ", s).strip()
+        s = _RE_WS.sub(" ", s).strip()
 
     if level >= 3:
         if len(s) > TITLE_HARD_TRIM_CHARS:
@@ -233,19 +249,48 @@ def hard_trim_title(s: str) -> str:
     return s
 
 
+def iter_title_candidates(base: str) -> Iterator[str]:
+    """
+    タイトル候補を試す順に返す（base は normalize_title 済み）。
+    base → 短縮 level 1..TITLE_SHORTEN_LEVELS（前段の結果に重ねる / 変化なしなら base から）→ 強制トリム
+    """
+    yield base
+    cur = base
+    for level in range(1, TITLE_SHORTEN_LEVELS + 1):
+        nxt = shorten_title_step(cur, level)
+        if not nxt or nxt == cur:
+            nxt = shorten_title_step(base, level)
+        cur = nxt
+        yield cur
+    yield hard_trim_title(base)
+
+
 # ======= 文字数（グラフェム）から初期フォントサイズを推定 =======
+# BMP の East Asian Width が F/W/A（全角扱い）なら 1（起動時に1回だけ作る）
+_EAW_WIDE_BMP = bytearray(
+    1 if unicodedata.east_asian_width(chr(i)) in ("F", "W", "A") else 0
+    for i in range(0x10000)
+)
+
+
+def _is_wide_char(o: int) -> bool:
+    if o < 0x10000:
+        return bool(_EAW_WIDE_BMP[o])
+    return unicodedata.east_asian_width(chr(o)) in ("F", "W", "A")
+
+
 def cluster_em_width_guess(cluster: str) -> float:
     if is_emoji_cluster(cluster):
         return 1.0
 
-    if all(ord(c) < 128 for c in cluster):
+    ords = [ord(c) for c in cluster]
+    if max(ords) < 128:
         if cluster.isspace():
             return 0.35
         return 0.55
 
-    for c in cluster:
-        eaw = unicodedata.east_asian_width(c)
-        if eaw in ("F", "W", "A"):
+    for o in ords:
+        if _is_wide_char(o):
             return 1.0
 
     return 0.7
@@ -267,7 +312,22 @@ def estimate_initial_font_size(text: str, box_w: int, max_lines: int, max_size:
 
 
 # ======= 計測（advance / bbox） =======
+# (id(font), 文字列) -> advance 幅。フォントは _JP_FONT_CACHE 等で生き続けるので id が使い回されることはない
+# 画像1枚ごとにクリア（メモリ上限）
+_ADV_CACHE: Dict[Tuple[int, str], int] = {}
+
+
 def _text_advance_w(draw: ImageDraw.ImageDraw, s: str, font: ImageFont.ImageFont) -> int:
+    key = (id(font), s)
+    v = _ADV_CACHE.get(key)
+    if v is not None:
+        return v
+    v = _text_advance_w_uncached(draw, s, font)
+    _ADV_CACHE[key] = v
+    return v
+
+
+def _text_advance_w_uncached(draw: ImageDraw.ImageDraw, s: str, font: ImageFont.ImageFont) -> int:
     try:
         return int(draw.textlength(s, font=font))
     except Exception:
@@ -294,13 +354,35 @@ def safe_draw_text(draw: ImageDraw.ImageDraw, xy, text, font, fill, embedded_col
         draw.text(xy, text, font=font, fill=fill)
 
 
+def _emoji_font_if_needed(text: str, emoji_font):
+    """text に絵文字が1つも無ければ None（クラスタごとの絵文字判定を丸ごと省く）。"""
+    if emoji_font is None or _RE_EMOJI_CHAR.search(text) is None:
+        return None
+    return emoji_font
+
+
+# (id(font), id(emoji_font), 行) -> (左端, 右端)。折り返し時に分かった値も入れておき、検証・描画で測り直さない
+# _ADV_CACHE と同じく画像1枚ごとにクリア
+_LINE_BOUNDS_CACHE: Dict[Tuple[int, int, str], Tuple[int, int]] = {}
+
+
 def line_bounds_clusters(draw: ImageDraw.ImageDraw, line: str, font, emoji_font) -> Tuple[int, int]:
+    key = (id(font), id(emoji_font), line)
+    v = _LINE_BOUNDS_CACHE.get(key)
+    if v is None:
+        v = _line_bounds_clusters_uncached(draw, line, font, emoji_font)
+        _LINE_BOUNDS_CACHE[key] = v
+    return v
+
+
+def _line_bounds_clusters_uncached(draw: ImageDraw.ImageDraw, line: str, font, emoji_font) -> Tuple[int, int]:
+    ef = _emoji_font_if_needed(line, emoji_font)
     cx = 0
     min_left = 10**9
     max_right = -10**9
 
     for cl in grapheme_clusters(line):
-        use_emoji = bool(emoji_font and is_emoji_cluster(cl))
+        use_emoji = bool(ef and is_emoji_cluster(cl))
         f = emoji_font if use_emoji else font
 
         bbox = draw.textbbox((cx, 0), cl, font=f)
@@ -320,37 +402,65 @@ def line_width_actual(draw: ImageDraw.ImageDraw, line: str, font, emoji_font) ->
 
 
 def draw_text_clusters(draw: ImageDraw.ImageDraw, x: int, y: int, text: str, font, emoji_font, fill):
+    ef = _emoji_font_if_needed(text, emoji_font)
     cx = x
     for cl in grapheme_clusters(text):
-        use_emoji = bool(emoji_font and is_emoji_cluster(cl))
+        use_emoji = bool(ef and is_emoji_cluster(cl))
         f = emoji_font if use_emoji else font
         safe_draw_text(draw, (cx, y), cl, f, fill, embedded_color=use_emoji)
         cx += _text_advance_w(draw, cl, f)
 
 
 def wrap_text_clusters(draw: ImageDraw.ImageDraw, text: str, font, emoji_font, max_w: int) -> List[str]:
+    """
+    line_width_actual と同じ幅（bbox の左端〜右端）で折り返す。
+    候補行を毎回測り直さず、line_bounds_clusters の途中状態（cx / 左端 / 右端）を1クラスタずつ進める。
+    """
+    ef = _emoji_font_if_needed(text, emoji_font)
     lines: List[str] = []
     buf: List[str] = []
+    cx = 0
+    min_left = 10**9
+    max_right = -10**9
+
+    def flush() -> None:
+        ln = "".join(buf)
+        lines.append(ln)
+        if buf:
+            bounds = (min_left, max_right) if max_right >= min_left else (0, 0)
+            _LINE_BOUNDS_CACHE[(id(font), id(emoji_font), ln)] = bounds
 
     for cl in grapheme_clusters(text):
         if cl == "\n":
-            lines.append("".join(buf))
+            flush()
             buf = []
+            cx, min_left, max_right = 0, 10**9, -10**9
             continue
 
-        candidate = "".join(buf) + cl
-        if buf and line_width_actual(draw, candidate, font, emoji_font) > max_w:
-            lines.append("".join(buf))
+        use_emoji = bool(ef and is_emoji_cluster(cl))
+        f = emoji_font if use_emoji else font
+
+        bbox = draw.textbbox((cx, 0), cl, font=f)
+        new_left = min(min_left, int(bbox[0]))
+        new_right = max(max_right, int(bbox[2]))
+        if buf and max(0, new_right - new_left) > max_w:
+            flush()
             buf = [cl]
+            bbox = draw.textbbox((0, 0), cl, font=f)
+            min_left, max_right = int(bbox[0]), int(bbox[2])
+            cx = _text_advance_w(draw, cl, f)
         else:
             buf.append(cl)
+            min_left, max_right = new_left, new_right
+            cx += _text_advance_w(draw, cl, f)
 
-        if len(buf) == 1 and line_width_actual(draw, buf[0], font, emoji_font) > max_w:
+        if len(buf) == 1 and max(0, max_right - min_left) > max_w:
             lines.append("…")
             buf = []
+            cx, min_left, max_right = 0, 10**9, -10**9
 
     if buf:
-        lines.append("".join(buf))
+        flush()
     return lines
 
 
@@ -358,13 +468,29 @@ def ellipsize_line_to_width(draw: ImageDraw.ImageDraw, line: str, font, emoji_fo
     ell = "…"
     ell_w = line_width_actual(draw, ell, font, emoji_font)
 
+    # 先頭 k クラスタの幅（bbox の左端〜右端）は k について単調増加なので、
+    # 前から1回だけ進めて最初にはみ出したところで切る
+    limit = max_w - ell_w
     clusters = grapheme_clusters(line)
-    while clusters:
-        cur = "".join(clusters)
-        if line_width_actual(draw, cur, font, emoji_font) + ell_w <= max_w:
-            return cur + ell
-        clusters.pop()
+    ef = _emoji_font_if_needed(line, emoji_font)
+    cx = 0
+    min_left = 10**9
+    max_right = -10**9
+    keep = 0
+    for cl in clusters:
+        use_emoji = bool(ef and is_emoji_cluster(cl))
+        f = emoji_font if use_emoji else font
 
+        bbox = draw.textbbox((cx, 0), cl, font=f)
+        min_left = min(min_left, int(bbox[0]))
+        max_right = max(max_right, int(bbox[2]))
+        if max(0, max_right - min_left) > limit:
+            break
+        keep += 1
+        cx += _text_advance_w(draw, cl, f)
+
+    if keep:
+        return "".join(clusters[:keep]) + ell
     return ell
 
 
@@ -388,6 +514,22 @@ def compute_line_step(draw: ImageDraw.ImageDraw, size: int, font, line_mult: flo
     return max(int(size * line_mult), base_h + 6)
 
 
+# (size, line_mult) -> (font, emoji_font, line_step)。サイズが決まれば3つとも決まるのでまとめて持つ
+_SIZE_BUNDLE_CACHE: Dict[Tuple[int, float], Tuple[ImageFont.ImageFont, Optional[ImageFont.ImageFont], int]] = {}
+
+
+def _size_bundle(
+    draw: ImageDraw.ImageDraw, size: int, line_mult: float
+) -> Tuple[ImageFont.ImageFont, Optional[ImageFont.ImageFont], int]:
+    key = (size, line_mult)
+    v = _SIZE_BUNDLE_CACHE.get(key)
+    if v is None:
+        font = load_font_from_candidates(size)
+        v = (font, load_emoji_font(size), compute_line_step(draw, size, font, line_mult))
+        _SIZE_BUNDLE_CACHE[key] = v
+    return v
+
+
 def fit_text_autosize(
     draw: ImageDraw.ImageDraw,
     text: str,
@@ -399,58 +541,85 @@ def fit_text_autosize(
     line_mult: float,
     target_fill: float,
 ):
-    best = None
-    best_gap = 10**9
-    best_underfill = None
-
     fit_w = max(1, box_w - SAFE_W_MARGIN)
 
     est = estimate_initial_font_size(text, fit_w, max_lines, max_size, min_size)
     start_size = min(max_size, est + ESTIMATE_HEADROOM)
 
-    for size in range(start_size, min_size - 1, -1):
-        font = load_font_from_candidates(size)
-        emoji_font = load_emoji_font(size)
+    # size -> (収まるか, fill, (lines, font, emoji_font, line_step, total_h, max_line_w))
+    measured: Dict[int, Tuple[bool, float, tuple]] = {}
+
+    def measure(size: int) -> Tuple[bool, float, tuple]:
+        if size in measured:
+            return measured[size]
+        font, emoji_font, line_step = _size_bundle(draw, size, line_mult)
 
         lines = wrap_text_clusters(draw, text, font, emoji_font, max_w=fit_w)
         lines = ellipsize_lines_to_fit(draw, lines, max_lines=max_lines, font=font, emoji_font=emoji_font, max_w=fit_w)
 
-        line_step = compute_line_step(draw, size, font, line_mult)
         total_h = line_step * len(lines)
-        if total_h > box_h:
-            continue
 
         max_line_w = 0
         for ln in lines:
             max_line_w = max(max_line_w, line_width_actual(draw, ln, font, emoji_font))
-        if max_line_w > fit_w:
-            continue
-
-        fill = total_h / max(1, box_h)
+        ok = total_h <= box_h and max_line_w <= fit_w
+
+        r = (ok, total_h / max(1, box_h), (lines, font, emoji_font, line_step, total_h, max_line_w))
+        measured[size] = r
+        return r
+
+    lo = min(min_size, start_size)
+    if not measure(lo)[0]:
+        # 最小サイズでも収まらない → 最小サイズで出す
+        return measure(min_size)[2]
+
+    # 1) 収まる最大サイズ（小さいほど収まりやすいので二分探索）
+    hi = start_size
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if measure(mid)[0]:
+            lo = mid
+        else:
+            hi = mid - 1
+    fit_max = lo
+
+    # 2) fill >= target_fill になる最小サイズ（fill はサイズに概ね比例するので二分探索）
+    if measure(fit_max)[1] < target_fill:
+        pivot = fit_max
+    else:
+        lo, hi = min(min_size, fit_max), fit_max
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ok, fill, _ = measure(mid)
+            if ok and fill >= target_fill:
+                hi = mid
+            else:
+                lo = mid + 1
+        pivot = lo
 
+    # 3) 行数が飛ぶところで取りこぼさないよう ±2 を見て選び直す
+    #    （fill >= target_fill で target に最も近いもの / 無ければ fill 最大。同点は大きいサイズ）
+    best = None
+    best_gap = 10**9
+    best_underfill = None
+    for size in range(min(fit_max, pivot + 2), max(min_size, pivot - 2) - 1, -1):
+        ok, fill, result = measure(size)
+        if not ok:
+            continue
         if fill >= target_fill:
             gap = abs(fill - target_fill)
             if gap < best_gap:
                 best_gap = gap
-                best = (lines, font, emoji_font, line_step, total_h)
+                best = result
         else:
             if best_underfill is None or fill > best_underfill[0]:
-                best_underfill = (fill, lines, font, emoji_font, line_step, total_h)
+                best_underfill = (fill, result)
 
     if best is not None:
         return best
-
     if best_underfill is not None:
-        _, lines, font, emoji_font, line_step, total_h = best_underfill
-        return lines, font, emoji_font, line_step, total_h
-
-    font = load_font_from_candidates(min_size)
-    emoji_font = load_emoji_font(min_size)
-    lines = wrap_text_clusters(draw, text, font, emoji_font, max_w=fit_w)
-    lines = ellipsize_lines_to_fit(draw, lines, max_lines=max_lines, font=font, emoji_font=emoji_font, max_w=fit_w)
-    line_step = compute_line_step(draw, min_size, font, line_mult)
-    total_h = line_step * len(lines)
-    return lines, font, emoji_font, line_step, total_h
+        return best_underfill[1]
+    return measure(fit_max)[2]
 
 
 def fit_text_autosize_flexible_lines(
@@ -468,24 +637,22 @@ def fit_text_autosize_flexible_lines(
     best = None
     best_score = None
 
+    fit_w = max(1, box_w - SAFE_W_MARGIN)
     for max_lines in range(max_lines_start, max_lines_cap + 1):
-        lines, font, emoji_font, line_step, total_h = fit_text_autosize(
+        result = fit_text_autosize(
             draw, text, box_w, box_h, max_size, min_size, max_lines, line_mult, target_fill
         )
+        lines, font, emoji_font, line_step, total_h, max_line_w = result
         if total_h > box_h:
             continue
-
-        fit_w = max(1, box_w - SAFE_W_MARGIN)
-        max_line_w = 0
-        for ln in lines:
-            max_line_w = max(max_line_w, line_width_actual(draw, ln, font, emoji_font))
+        # 幅は fit_text_autosize が測った値をそのまま使う
         if max_line_w > fit_w:
             continue
 
         size = int(getattr(font, "size", 0)) if hasattr(font, "size") else 0
         score = (-size, len(lines))
         if best is None or score < best_score:
-            best = (lines, font, emoji_font, line_step, total_h)
+            best = result
             best_score = score
 
     if best is not None:
@@ -501,6 +668,7 @@ def calc_start_y(box_h: int, total_h: int) -> int:
 
 
 def _line_start_x_for_bbox(draw: ImageDraw.ImageDraw, base_x: int, line: str, font, emoji_font) -> int:
+    # 描画する行は折り返し／幅チェックの時点で _LINE_BOUNDS_CACHE に入っているので、ここは測り直さない
     left, _ = line_bounds_clusters(draw, line, font, emoji_font)
     if left < 0:
         return base_x - left
@@ -508,45 +676,50 @@ def _line_start_x_for_bbox(draw: ImageDraw.ImageDraw, base_x: int, line: str, fo
 
 
 def try_fit_title(draw: ImageDraw.ImageDraw, title: str, box_w: int, box_h: int):
-    lines, font, emoji_font, line_step, total_h = fit_text_autosize_flexible_lines(
+    lines, font, emoji_font, line_step, total_h, max_line_w = fit_text_autosize_flexible_lines(
         draw, title, box_w, box_h,
         TITLE_FONT_MAX, TITLE_FONT_MIN,
         TITLE_MAX_LINES_START, TITLE_MAX_LINES_CAP,
         TITLE_LINE_MULT, TARGET_FILL
     )
     ok = (total_h <= box_h)
-    return ok, (lines, font, emoji_font, line_step, total_h)
+    return ok, (lines, font, emoji_font, line_step, total_h, max_line_w)
+
+
+# (w, h) -> 使い回すキャンバス（プロセスごとに1枚。毎回透明で塗りつぶしてから描く）
+_CANVAS_CACHE: Dict[Tuple[int, int], Image.Image] = {}
+
+
+def _blank_canvas(w: int, h: int) -> Image.Image:
+    img = _CANVAS_CACHE.get((w, h))
+    if img is None:
+        img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+        _CANVAS_CACHE[(w, h)] = img
+    else:
+        img.paste((0, 0, 0, 0), (0, 0, w, h))
+    return img
 
 
 def make_title_png(title: str, out_path: Path):
-    img = Image.new("RGBA", (TITLE_W, TITLE_H), (0, 0, 0, 0))
+    _ADV_CACHE.clear()
+    _LINE_BOUNDS_CACHE.clear()
+    img = _blank_canvas(TITLE_W, TITLE_H)
     d = ImageDraw.Draw(img)
     d.rounded_rectangle([0, 0, TITLE_W, TITLE_H], radius=RADIUS, fill=(0, 0, 0, BG_ALPHA))
 
     box_w = TITLE_W - PADDING_X * 2
     box_h = TITLE_H - PADDING_Y * 2
 
-    base = normalize_title(title)
-    ok, fitted = try_fit_title(d, base, box_w, box_h)
-    chosen_title = base
-
-    if not ok:
-        cur = base
-        for level in range(1, TITLE_SHORTEN_LEVELS + 1):
-            cur2 = shorten_title_step(cur, level)
-            if not cur2 or cur2 == cur:
-                cur2 = shorten_title_step(base, level)
-            cur = cur2
-            ok, fitted = try_fit_title(d, cur, box_w, box_h)
-            chosen_title = cur
-            if ok:
-                break
-
-    if not ok:
-        chosen_title = hard_trim_title(base)
-        ok, fitted = try_fit_title(d, chosen_title, box_w, box_h)
+    # 同じ候補が何度も出てくる（短縮しても変わらない段など）ので、フィット結果は候補文字列ごとに使い回す
+    tried: Dict[str, tuple] = {}
+    for cand in iter_title_candidates(normalize_title(title)):
+        if cand not in tried:
+            tried[cand] = try_fit_title(d, cand, box_w, box_h)
+        ok, fitted = tried[cand]
+        if ok:
+            break
 
-    lines, font, emoji_font, line_step, total_h = fitted
+    lines, font, emoji_font, line_step, total_h, _ = fitted
 
     y = PADDING_Y + calc_start_y(box_h, total_h)
     for line in lines:
@@ -555,11 +728,13 @@ def make_title_png(title: str, out_path: Path):
         y += line_step
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
+    img.save(out_path, format="PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
 
 
 def make_comment_png(rank: int, text: str, out_path: Path):
-    img = Image.new("RGBA", (COMMENT_W, COMMENT_H), (0, 0, 0, 0))
+    _ADV_CACHE.clear()
+    _LINE_BOUNDS_CACHE.clear()
+    img = _blank_canvas(COMMENT_W, COMMENT_H)
     d = ImageDraw.Draw(img)
     d.rounded_rectangle([0, 0, COMMENT_W, COMMENT_H], radius=RADIUS, fill=(0, 0, 0, BG_ALPHA))
 
@@ -568,7 +743,7 @@ def make_comment_png(rank: int, text: str, out_path: Path):
     box_w = COMMENT_W - PADDING_X * 2
     box_h = COMMENT_H - PADDING_Y * 2
 
-    lines, font, emoji_font, line_step, total_h = fit_text_autosize(
+    lines, font, emoji_font, line_step, total_h, _ = fit_text_autosize(
         d, line_text, box_w, box_h,
         COMMENT_FONT_MAX, COMMENT_FONT_MIN,
         COMMENT_MAX_LINES, COMMENT_LINE_MULT, TARGET_FILL
@@ -581,7 +756,25 @@ def make_comment_png(rank: int, text: str, out_path: Path):
         y += line_step
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path)
+    img.save(out_path, format="PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
+
+
+def prewarm_fonts(min_size: int, max_size: int) -> None:
+    """min_size〜max_size のフォントを先に読み込んでキャッシュしておく。"""
+    for size in range(min_size, max_size + 1):
+        load_font_from_candidates(size)
+        load_emoji_font(size)
+
+
+def _init_comment_worker() -> None:
+    """ProcessPoolExecutor の initializer。ワーカーごとにコメント用サイズのフォントを先読みする。"""
+    prewarm_fonts(COMMENT_FONT_MIN, COMMENT_FONT_MAX)
+
+
+def _render_comment(job: Tuple[int, str, Path]) -> None:
+    """ProcessPoolExecutor から呼ぶためのモジュールレベル関数。"""
+    rank, text, out = job
+    make_comment_png(rank, text, out)
 
 
 def main() -> int:
@@ -614,13 +807,22 @@ def main() -> int:
             title = str(meta.get("title", "")).strip()
             make_title_png(title, out_title)
 
+            jobs = [
+                (int(it["rank"]), str(it["text"]).strip(), out_comment_dir / f"{int(it['rank'])}.png")
+                for it in items
+            ]
+            workers = IMAGE_WORKERS if IMAGE_WORKERS > 0 else (os.cpu_count() or 1)
+            workers = min(workers, len(jobs))
+
             created = 0
-            for it in items:
-                rank = int(it["rank"])
-                text = str(it["text"]).strip()
-                out = out_comment_dir / f"{rank}.png"
-                make_comment_png(rank, text, out)
-                created += 1
+            if workers <= 1:
+                for job in jobs:
+                    _render_comment(job)
+                    created += 1
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_comment_worker) as ex:
+                    for _ in ex.map(_render_comment, jobs):
+                        created += 1
 
             print("[OK] created images")
             print(f"  TITLE  : {out_title}")
@@ -110,7 +110,7 @@ class QueueConfig:
     base_output_root: Path
 
     busy_timeout_ms: int = 60000
-    sqlite_wal: bool = True
+    sqlite_journal_mode: str = "WAL"    # config で SQLITE_WAL も見て決めた値（全スクリプト共通）
     sqlite_synchronous: str = "NORMAL"  # NORMAL/OFF/FULL 等
 
     # pick高速化（運用でON/OFF）
@@ -126,7 +126,7 @@ def build_queue_config_from_env() -> QueueConfig:
     table = (CFG.TABLE_NAME or "items").strip() or "items"
 
     busy = CFG.BUSY_TIMEOUT_MS
-    wal = CFG.SQLITE_WAL
+    journal = CFG.SQLITE_JOURNAL_MODE
     sync = (CFG.SQLITE_SYNCHRONOUS or "NORMAL").strip().upper() or "NORMAL"
 
     enable_idx = CFG.ENABLE_PICK_QUEUE_INDEX
@@ -137,7 +137,7 @@ def build_queue_config_from_env() -> QueueConfig:
         table=table,
         base_output_root=base_output_root,
         busy_timeout_ms=busy,
-        sqlite_wal=wal,
+        sqlite_journal_mode=journal,
         sqlite_synchronous=sync,
         enable_pick_queue_index=enable_idx,
         pick_queue_index_name=idx_name,
@@ -151,8 +151,8 @@ def connect_db(cfg: QueueConfig) -> sqlite3.Connection:
     con = sqlite3.connect(str(cfg.db_path), timeout=cfg.busy_timeout_ms / 1000)
     con.row_factory = sqlite3.Row
 
-    if cfg.sqlite_wal:
-        con.execute("PRAGMA journal_mode=WAL;")
+    if cfg.sqlite_journal_mode:
+        con.execute(f"PRAGMA journal_mode={cfg.sqlite_journal_mode};")
     con.execute(f"PRAGMA synchronous={cfg.sqlite_synchronous};")
     con.execute(f"PRAGMA busy_timeout={int(cfg.busy_timeout_ms)};")
     return con
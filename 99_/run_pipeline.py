@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 import argparse
+import codecs
+import os
 import sqlite3
 import subprocess
 import sys
@@ -90,17 +92,22 @@ TIMEOUT_SCHEDULE = CFG.TIMEOUT_SCHEDULE
 # --- sqlite pragmas（運用：env）---
 BUSY_TIMEOUT_MS = CFG.BUSY_TIMEOUT_MS
 
-# 互換：SQLITE_WAL=true があるなら WAL 優先。無ければ SQLITE_JOURNAL_MODE を使う。
-SQLITE_WAL = CFG.SQLITE_WAL
-SQLITE_JOURNAL_MODE = (CFG.SQLITE_JOURNAL_MODE or ("WAL" if SQLITE_WAL else "")).strip()
+# journal_mode は config で1回だけ決める（SQLITE_WAL=false なら DELETE。子スクリプトと同じ値を使う）
+SQLITE_JOURNAL_MODE = CFG.SQLITE_JOURNAL_MODE
 SQLITE_SYNCHRONOUS = (CFG.SQLITE_SYNCHRONOUS or "NORMAL").strip()
+SQLITE_CACHE_SIZE_KB = 20000  # ページキャッシュ（KiB。PRAGMA cache_size に負値で渡す）
 
 
 # =========================================================
 # 共通
 # =========================================================
+JST = ZoneInfo("Asia/Tokyo")
+
+
 def now_jst_str() -> str:
-    return datetime.now(ZoneInfo("Asia/Tokyo")).strftime("%Y-%m-%d %H:%M:%S")
+    # UPDATE/ログのたびに呼ばれるので、tz は使い回して strftime も通さない
+    dt = datetime.now(JST)
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
 
 
 def banner(msg: str) -> None:
@@ -131,46 +138,60 @@ def connect(db_path: Path) -> sqlite3.Connection:
         con.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE};")
     if SQLITE_SYNCHRONOUS:
         con.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS};")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute(f"PRAGMA cache_size={-int(SQLITE_CACHE_SIZE_KB)};")
     return con
 
 
-def ensure_columns(con: sqlite3.Connection) -> None:
-    cur = con.execute(f"PRAGMA table_info({TABLE_NAME})")
-    cols = {row[1] for row in cur.fetchall()}
+# 不足していたら追加するカラム（name, 型/DEFAULT）
+EXTRA_COLUMNS: List[Tuple[str, str]] = [
+    ("check_create", "INTEGER DEFAULT 0"),
+    ("folder_name", "TEXT"),
+    ("last_error", "TEXT"),
+    ("updated_at", "TEXT"),
+    ("video_created", "INTEGER DEFAULT 0"),
+    ("video_created_at", "TEXT"),
+    ("video_uploaded", "INTEGER DEFAULT 0"),
+    ("video_uploaded_at", "TEXT"),
+]
 
-    def add_col(sql: str):
-        try:
-            con.execute(sql)
-        except Exception:
-            pass
-
-    if "check_create" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN check_create INTEGER DEFAULT 0")
-    if "folder_name" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN folder_name TEXT")
-    if "last_error" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN last_error TEXT")
-    if "updated_at" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN updated_at TEXT")
-
-    if "video_created" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN video_created INTEGER DEFAULT 0")
-    if "video_created_at" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN video_created_at TEXT")
-    if "video_uploaded" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN video_uploaded INTEGER DEFAULT 0")
-    if "video_uploaded_at" not in cols:
-        add_col(f"ALTER TABLE {TABLE_NAME} ADD COLUMN video_uploaded_at TEXT")
-
-    if ENABLE_PICK_QUEUE_INDEX:
+_COLUMNS_ENSURED = False
+
+
+def ensure_columns(con: sqlite3.Connection) -> None:
+    """
+    不足カラム/pickインデックスを追加する（プロセス内で1回だけ）。
+    足りないものがある時だけ BEGIN IMMEDIATE を取り、DDL をまとめて1回の COMMIT にする。
+    """
+    global _COLUMNS_ENSURED
+    if _COLUMNS_ENSURED:
+        return
+
+    def missing_ddl() -> List[str]:
+        cols = {row[1] for row in con.execute(f"PRAGMA table_info({TABLE_NAME})")}
+        ddl = [
+            f"ALTER TABLE {TABLE_NAME} ADD COLUMN {name} {decl}"
+            for name, decl in EXTRA_COLUMNS
+            if name not in cols
+        ]
+        if ENABLE_PICK_QUEUE_INDEX and con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (PICK_QUEUE_INDEX_NAME,)
+        ).fetchone() is None:
+            ddl.append(f"CREATE INDEX IF NOT EXISTS {PICK_QUEUE_INDEX_NAME} ON {PICK_QUEUE_INDEX_SQL}")
+        return ddl
+
+    if missing_ddl():
+        con.execute("BEGIN IMMEDIATE;")
         try:
-            con.execute(
-                f"CREATE INDEX IF NOT EXISTS {PICK_QUEUE_INDEX_NAME} ON {PICK_QUEUE_INDEX_SQL}"
-            )
+            # ロックを取ってから見直す（他プロセスが先に追加していても重複 ALTER しない）
+            for sql in missing_ddl():
+                con.execute(sql)
+            con.execute("COMMIT;")
         except Exception:
-            pass
+            con.execute("ROLLBACK;")
+            raise
 
-    con.commit()
+    _COLUMNS_ENSURED = True
 
 
 def update_item(con: sqlite3.Connection, item_id: int, *, check_create: int, last_error: Optional[str]) -> None:
@@ -205,6 +226,9 @@ def require_stage(con: sqlite3.Connection, item_id: int, expected: int, label: s
     return folder
 
 
+PUMP_CHUNK_BYTES = 65536  # 子プロセス出力を1回に読む最大バイト数
+
+
 def run_script_realtime(script_path: Path, timeout: Optional[int], extra_args: Optional[List[str]] = None) -> None:
     if not script_path.exists():
         raise FileNotFoundError(f"script not found: {script_path}")
@@ -216,25 +240,47 @@ def run_script_realtime(script_path: Path, timeout: Optional[int], extra_args: O
     print("[RUN]", " ".join(cmd))
     start = time.time()
 
+    # ★子の出力は行ごとに decode/encode せず、バイトのまま流す
+    # 子の stdout/stderr は親の stdout と同じエンコーディングに揃える
+    #  （リダイレクト先が cp932 でも、ログに親の文字列と子のバイト列が混ざらないように。
+    #   PYTHONIOENCODING が既に別の値でも上書きする / 表せない文字は ? に置き換えて子を落とさない）
+    out_encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+    env = dict(os.environ)
+    env["PYTHONIOENCODING"] = f"{out_encoding}:replace"
+    out = getattr(sys.stdout, "buffer", None)
+    decoder = None if out is not None else codecs.getincrementaldecoder(out_encoding)(errors="replace")
+    sys.stdout.flush()  # [RUN] 行などテキスト側を先に出しておく
+
     p = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
+        bufsize=0,
+        env=env,
     )
 
     try:
         assert p.stdout is not None
-        for line in p.stdout:
-            print(line.rstrip("\n"))
+        fd = p.stdout.fileno()
+        while True:
+            chunk = os.read(fd, PUMP_CHUNK_BYTES)  # 届いた分だけ返る（EOFで b""）
+            if not chunk:
+                break
+            if out is not None:
+                out.write(chunk)
+                out.flush()
+            else:
+                # sys.stdout が差し替えられていて buffer が無い環境向け
+                sys.stdout.write(decoder.decode(chunk))
+                sys.stdout.flush()
         rc = p.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
         p.kill()
         raise RuntimeError(f"{script_path.name} timeout")
     finally:
         elapsed = time.time() - start
+        if p.stdout is not None:
+            p.stdout.close()
 
     if rc != 0:
         raise RuntimeError(f"{script_path.name} failed (exit={rc})")
@@ -293,10 +339,11 @@ def guard_unique_stage(con: sqlite3.Connection, stage: int) -> None:
         )
 
 
-def pick_inprogress_job(con: sqlite3.Connection) -> Optional[sqlite3.Row]:
+def pick_and_lock(con: sqlite3.Connection) -> Optional[sqlite3.Row]:
     """
-    途中（STA群）を優先して拾う。
-    数値の大小に依存しないよう、明示順（02→03→04→05→99）で並べる。
+    途中（STA群）を優先して拾い、無ければ新規(0)を拾って 0→STA_02 にする。
+    どちらも1つの BEGIN IMMEDIATE の中で行う（読んでから更新するまでに別ランチャーが割り込まない）。
+    途中は数値の大小に依存しないよう、明示順（02→03→04→05→99）で並べる。
     """
     stages = (STA_02, STA_03, STA_04, STA_05, STA_99)
     q = ",".join(["?"] * len(stages))
@@ -312,55 +359,48 @@ def pick_inprogress_job(con: sqlite3.Connection) -> Optional[sqlite3.Row]:
     END
     """
 
-    return con.execute(
-        f"""
-        SELECT *
-          FROM {TABLE_NAME}
-         WHERE check_create IN ({q})
-         ORDER BY {order_case} ASC, id DESC
-         LIMIT 1
-        """,
-        tuple(int(x) for x in stages),
-    ).fetchone()
-
-
-def lock_new_job_atomic(con: sqlite3.Connection) -> Optional[sqlite3.Row]:
-    """新規(0)を拾って、0→STA_02 を原子的に実行。"""
     con.execute("BEGIN IMMEDIATE;")
     try:
         row = con.execute(
             f"""
             SELECT *
               FROM {TABLE_NAME}
-             WHERE check_create = 0
-             ORDER BY {PICK_NEW_ORDER_SQL}
+             WHERE check_create IN ({q})
+             ORDER BY {order_case} ASC, id DESC
              LIMIT 1
-            """
-        ).fetchone()
-
-        if not row:
-            con.execute("ROLLBACK;")
-            return None
-
-        item_id = int(row["id"])
-
-        con.execute(
-            f"""
-            UPDATE {TABLE_NAME}
-               SET check_create = ?,
-                   last_error   = NULL,
-                   updated_at   = ?
-             WHERE id = ? AND check_create = 0
             """,
-            (int(STA_02), now_jst_str(), int(item_id)),
-        )
+            tuple(int(x) for x in stages),
+        ).fetchone()
 
-        if con.total_changes == 0:
-            con.execute("ROLLBACK;")
-            return None
+        if row is None:
+            new = con.execute(
+                f"""
+                SELECT id
+                  FROM {TABLE_NAME}
+                 WHERE check_create = 0
+                 ORDER BY {PICK_NEW_ORDER_SQL}
+                 LIMIT 1
+                """
+            ).fetchone()
+
+            if new is not None:
+                item_id = int(new["id"])
+                cur = con.execute(
+                    f"""
+                    UPDATE {TABLE_NAME}
+                       SET check_create = ?,
+                           last_error   = NULL,
+                           updated_at   = ?
+                     WHERE id = ? AND check_create = 0
+                    """,
+                    (int(STA_02), now_jst_str(), item_id),
+                )
+                # total_changes は接続の累計なので、この UPDATE の件数は rowcount で見る
+                if cur.rowcount == 1:
+                    row = con.execute(f"SELECT * FROM {TABLE_NAME} WHERE id=?", (item_id,)).fetchone()
 
         con.execute("COMMIT;")
-        return con.execute(f"SELECT * FROM {TABLE_NAME} WHERE id=?", (int(item_id),)).fetchone()
+        return row
 
     except Exception:
         con.execute("ROLLBACK;")
@@ -370,9 +410,7 @@ def lock_new_job_atomic(con: sqlite3.Connection) -> Optional[sqlite3.Row]:
 def process_one_item(con: sqlite3.Connection) -> int:
     ensure_columns(con)
 
-    row = pick_inprogress_job(con)
-    if row is None:
-        row = lock_new_job_atomic(con)
+    row = pick_and_lock(con)
 
     if row is None:
         print("[INFO] no item to process (no 0 and no STA stages).")
@@ -521,7 +559,10 @@ def main() -> int:
     print(f"[CONF] STOP_ON_ERROR     : {STOP_ON_ERROR}")
     print(f"[CONF] RESET_TO_ZERO_ON_FAIL_02: {RESET_TO_ZERO_ON_FAIL_02}")
     print(f"[CONF] SLEEP_SEC_WHEN_EMPTY: {SLEEP_SEC_WHEN_EMPTY}")
-    print(f"[CONF] sqlite journal_mode={SQLITE_JOURNAL_MODE} synchronous={SQLITE_SYNCHRONOUS} busy_timeout_ms={BUSY_TIMEOUT_MS}")
+    print(
+        f"[CONF] sqlite journal_mode={SQLITE_JOURNAL_MODE} synchronous={SQLITE_SYNCHRONOUS} "
+        f"busy_timeout_ms={BUSY_TIMEOUT_MS} cache_size_kb={SQLITE_CACHE_SIZE_KB}"
+    )
 
     print(f"[CONF] STA/END 02: {STA_02}->{END_02}")
     print(f"[CONF] STA/END 03: {STA_03}->{END_03}")
@@ -35,6 +35,8 @@ if not _DB_PATH:
 _BASE_OUTPUT_ROOT = CFG.BASE_OUTPUT_ROOT
 if not _BASE_OUTPUT_ROOT:
     raise SystemExit("BASE_OUTPUT_ROOT が未設定です（girlsChannel.env を確認してください）")
+# journal_mode は他のスクリプトと同じ値（config で SQLITE_WAL も見て決める）
+_SQLITE_JOURNAL_MODE = CFG.SQLITE_JOURNAL_MODE
 
 # =============================================================================
 # 設定（ここだけ変えればOK）
@@ -225,7 +227,7 @@ def connect_db(db_path: Path) -> sqlite3.Connection:
         raise FileNotFoundError(f"DBが見つかりません: {db_path}")
     con = sqlite3.connect(str(db_path))
     con.row_factory = sqlite3.Row
-    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute(f"PRAGMA journal_mode={_SQLITE_JOURNAL_MODE};")
     con.execute("PRAGMA synchronous=NORMAL;")
     return con
 